@@ -4,9 +4,10 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QCalendarWidget, QHBoxLayout, QFrame,
     QScrollArea, QGridLayout, QLabel, QToolButton
 )
-from TimeLocationUtils import get_today_date
+from TimeLocationUtils import get_clock, get_today_date
 from ToDoPage import ToDoCard
 from Expdb_manager import ExpDBManager
+from Exp_Widgets import format_amount
 from Tddb_manager import DBManager
 from UIDesign import UIDesign
 
@@ -36,8 +37,8 @@ class MiniExpenseCard(QWidget):
         self.amount_label = QLabel(self)
         self.amount_label.setGeometry(230, 10, 80, 20)
         self.amount_label.setStyleSheet("color: white; font-size: 14px; background-color: transparent;")
-        amt_str = self.record_data.get("amount", "0")
-        self.amount_label.setText(f"{amt_str} £")
+        self.amount_label.setText(format_amount(self.record_data.get("amount", 0),
+                                                self.record_data.get("currency", "GBP")))
 
 class CalendarPage(QWidget):
     def __init__(self, parent=None):
@@ -109,9 +110,8 @@ class CalendarPage(QWidget):
         self.expense_scroll.setWidget(self.expense_container)
         self.detail_layout.addWidget(self.expense_scroll)
 
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.highlight_today)
-        self.refresh_timer.start(60 * 1000)
+        # move the highlight when the shared clock passes midnight
+        get_clock().date_changed.connect(lambda snapshot: self.highlight_today())
 
         # load today's record by default
         today = get_today_date()
@@ -158,8 +158,7 @@ class CalendarPage(QWidget):
         date_str = qdate.toString("yyyy-MM-dd")
         # select today's record
         db_todo = DBManager()
-        all_tasks = db_todo.fetch_all_tasks()
-        tasks_for_date = [t for t in all_tasks if t["date"] == date_str]
+        tasks_for_date = db_todo.fetch_tasks(date_from=date_str, date_to=date_str)
         db_todo.close()
         # two column to show to do card
         for idx, task in enumerate(tasks_for_date):
@@ -0,0 +1,67 @@
+import atexit
+import os
+import sqlite3
+import threading
+
+# applied to every pooled connection; WAL lets readers and the writer work at
+# the same time and, with synchronous=NORMAL, a commit appends to the log
+# instead of syncing the rollback journal and the database file
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 64 * 1024 * 1024),
+    ("cache_size", -8000),  # negative: KiB, so about 8 MB
+    ("temp_store", "MEMORY"),
+)
+# prepared statements kept per connection; all managers of one database file
+# share a connection, so they share this cache too
+CACHED_STATEMENTS = 256
+
+_connections = {}
+_lock = threading.Lock()
+
+def _key(db_path):
+    if db_path == ":memory:":
+        return db_path, threading.get_ident()
+    return os.path.realpath(db_path), threading.get_ident()
+
+def open_shared(db_path):
+    """
+    Return (connection, created) for db_path. Every caller in the same thread
+    gets the same connection, opened once with PRAGMAS; created is True only
+    for the first caller, which should set up the schema. Connections stay
+    open until close_all (at exit), so managers can be made and dropped freely.
+    """
+    key = _key(db_path)
+    with _lock:
+        conn = _connections.get(key)
+        if conn is not None:
+            return conn, False
+        conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                print(f"Error setting PRAGMA {name} on {db_path}: {e}")
+        _connections[key] = conn
+        return conn, True
+
+def close_shared(db_path):
+    """Close and forget the connection of db_path in this thread, e.g. when its schema could not be set up"""
+    with _lock:
+        conn = _connections.pop(_key(db_path), None)
+    if conn is not None:
+        conn.close()
+
+def close_all():
+    """Close every pooled connection; the last close also checkpoints the WAL"""
+    with _lock:
+        for conn in _connections.values():
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database: {e}")
+        _connections.clear()
+
+atexit.register(close_all)
@@ -0,0 +1,178 @@
+import csv
+import functools
+import os
+from datetime import datetime
+
+from Expdb_manager import ExpDBManager, PAY_FIELDS
+
+DEFAULT_CATEGORY = "Imported"
+# CSV headers accepted for each record field, compared in lower case
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date"),
+    "time": ("time",),
+    "method": ("method",),
+    "amount": ("amount", "value"),
+    "category": ("category",),
+    "payee": ("payee", "payer", "payerorpayee", "name", "description"),
+    "comment": ("comment", "memo", "reference", "notes"),
+    # statements with separate columns for money out and in
+    "debit": ("debit", "debit amount", "paid out", "money out"),
+    "credit": ("credit", "credit amount", "paid in", "money in"),
+}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%Y%m%d")
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(text: str) -> str:
+    """A statement date in one of DATE_FORMATS -> yyyy-MM-dd"""
+    text = text.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"unknown date format: {text!r}")
+
+def parse_amount(text: str) -> float:
+    # "£1,234.50" -> 1234.5
+    return float(text.strip().lstrip("£$€").replace(",", "").replace(" ", ""))
+
+def _ofx_elements(f, chunk_size=1 << 16):
+    # yields (TAG, text) for every tag of an OFX file, SGML (1.x) or XML (2.x),
+    # reading it in chunks so only one unfinished tag is ever buffered
+    buffer = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        parts = (buffer + chunk).split("<")
+        buffer = parts.pop()
+        for part in parts:
+            tag, _, text = part.partition(">")
+            yield tag.strip().upper(), text.strip()
+    if buffer:
+        tag, _, text = buffer.partition(">")
+        yield tag.strip().upper(), text.strip()
+
+class ExpenseImporter:
+    """
+    Streams bank statements (CSV or OFX/QFX) into the expense database. Records
+    are parsed lazily and written by ExpDBManager.insert_pay_data_many in a
+    single transaction, so memory stays flat however long the file is, and a
+    failed import leaves the database unchanged. Rows that cannot be parsed
+    are skipped and counted. Categories that do not exist yet are added.
+    """
+    def __init__(self, manager=None, category=DEFAULT_CATEGORY, method="Card"):
+        self.manager = manager or ExpDBManager()
+        self.category = category
+        self.method = method
+        self.skipped = 0
+        self.categories = set()
+
+    def _skip(self, line, error):
+        self.skipped += 1
+        if self.skipped <= 5:
+            print(f"Skipping statement row {line}: {error}")
+
+    def read_csv(self, path):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = [name.strip().lower() for name in next(reader, [])]
+            columns = {}
+            for field, names in CSV_COLUMNS.items():
+                for name in names:
+                    if name in header:
+                        columns[field] = header.index(name)
+                        break
+            if "date" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+                raise ValueError(f"{path}: needs a date column and an amount (or debit/credit) column")
+            # short rows are padded to the header; a column the file does not
+            # have reads "" (None index), extra trailing cells are ignored
+            width = len(header)
+            date, time, method, amount, category, payee, comment, debit, credit = (
+                columns.get(field) for field in CSV_COLUMNS
+            )
+
+            def cell(row, index):
+                return "" if index is None else row[index].strip()
+
+            for line, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+                try:
+                    if amount is not None:
+                        value = parse_amount(row[amount])
+                    else:
+                        paid_in, paid_out = cell(row, credit), cell(row, debit)
+                        if not paid_in and not paid_out:
+                            raise ValueError("no amount")
+                        value = parse_amount(paid_in) if paid_in else 0.0
+                        if paid_out:
+                            value -= abs(parse_amount(paid_out))
+                    yield (
+                        parse_date(row[date]),
+                        cell(row, time) or "00:00",
+                        cell(row, method) or self.method,
+                        value,
+                        cell(row, category) or self.category,
+                        cell(row, payee),
+                        cell(row, comment),
+                    )
+                except ValueError as e:
+                    self._skip(line, e)
+
+    def read_ofx(self, path):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            transaction = None
+            number = 0
+            for tag, text in _ofx_elements(f):
+                if tag == "STMTTRN":
+                    transaction = {}
+                elif tag == "/STMTTRN" and transaction is not None:
+                    number += 1
+                    try:
+                        yield self._ofx_record(transaction)
+                    except (KeyError, ValueError) as e:
+                        self._skip(f"transaction {number}", e)
+                    transaction = None
+                elif transaction is not None and text and not tag.startswith("/"):
+                    transaction.setdefault(tag, text)
+
+    def _ofx_record(self, transaction):
+        # DTPOSTED is YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]
+        posted = transaction["DTPOSTED"]
+        time = f"{posted[8:10]}:{posted[10:12]}" if len(posted) >= 12 and posted[8:12].isdigit() else "00:00"
+        return (
+            parse_date(posted[:8]),
+            time,
+            "Cash" if transaction.get("TRNTYPE") == "ATM" else self.method,
+            parse_amount(transaction["TRNAMT"]),
+            self.category,
+            transaction.get("NAME", transaction.get("PAYEE", "")),
+            transaction.get("MEMO", ""),
+        )
+
+    def read(self, path):
+        """Record tuples (in PAY_FIELDS order) of a statement, parsed as they are read"""
+        if os.path.splitext(path)[1].lower() in (".ofx", ".qfx"):
+            return self.read_ofx(path)
+        return self.read_csv(path)
+
+    def _collect_categories(self, records):
+        category = PAY_FIELDS.index("category")
+        for record in records:
+            self.categories.add(record[category])
+            yield record
+
+    def import_file(self, path) -> range:
+        """Import one statement; returns the ids of the new records"""
+        self.skipped = 0
+        self.categories = set()
+        ids = self.manager.insert_pay_data_many(self._collect_categories(self.read(path)))
+        known = {row["category"].lower() for row in self.manager.get_categories()}
+        for category in sorted(self.categories):
+            if category.lower() not in known:
+                self.manager.insert_category(category)
+                known.add(category.lower())
+        return ids
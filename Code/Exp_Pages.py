@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import QWidget, QFrame, QLabel, QPushButton, QScrollArea, Q
 from Exp_Dialogs import AddExpenseDialog
 from Exp_Widgets import ExpenseCard, MonthSummaryWidget, PieChart
 from Expdb_manager import ExpDBManager
+from SearchBox import MARK_END, MARK_START, ResultStream, marked_html
 from UIDesign import UIDesign
 from matplotlib import cm
 
@@ -419,10 +420,7 @@ class SummaryPage(QWidget):
             for m in month_list:
                 self.period_combo.addItem(m)
         else:
-            c = self.db.conn.cursor()
-            c.execute("SELECT DISTINCT substr(date,1,4) AS y FROM pay_data ORDER BY y ASC")
-            rows = c.fetchall()
-            years = sorted({r["y"] for r in rows if r["y"]}, reverse=True)
+            years = self.db.get_years()
             if not years:
                 years = ["2025"]
             for y in years:
@@ -539,11 +537,10 @@ class SummaryPage(QWidget):
             months_list.append(f"{y:04d}-{m:02d}")
         months_list.reverse()
         months_list.append(month_str)
-        incomes, expenses = [], []
-        for ms in months_list:
-            st = self.db.get_monthly_statistics(ms)
-            incomes.append(st["income"])
-            expenses.append(st["expense"])
+        # all five months in one query
+        stats = self.db.get_period_statistics(months_list)
+        incomes = [st["income"] for st in stats]
+        expenses = [st["expense"] for st in stats]
         fig = self.bar_figure
         fig.clear()
         ax = fig.add_subplot(111)
@@ -572,9 +569,9 @@ class SummaryPage(QWidget):
         income = stats["income"]
         expense = stats["expense"]
         net = income - expense
-        self.label_income.setText(f"Income: {income}")
-        self.label_expense.setText(f"Expense: {expense}")
-        self.label_net.setText(f"Net: {net}")
+        self.label_income.setText(f"Income: {income:.2f}")
+        self.label_expense.setText(f"Expense: {expense:.2f}")
+        self.label_net.setText(f"Net: {net:.2f}")
 
     def _update_yearly_pie(self, year_str):
         # get data from database
@@ -654,19 +651,10 @@ class SummaryPage(QWidget):
         for i in range(4):
             years_list.append(str(current_year - 4 + i))
         years_list.append(year_str)
-        year_incomes = []
-        year_expenses = []
-        for y in years_list:
-            cat_list = self.db.get_category_net_by_year(y)
-            tincome, texpense = 0, 0
-            for item in cat_list:
-                net = item["net"]
-                if net > 0:
-                    tincome += net
-                else:
-                    texpense += abs(net)
-            year_incomes.append(tincome)
-            year_expenses.append(texpense)
+        # all five years in one query
+        stats = self.db.get_period_statistics(years_list)
+        year_incomes = [st["income"] for st in stats]
+        year_expenses = [st["expense"] for st in stats]
         fig = self.bar_figure
         fig.clear()
         ax = fig.add_subplot(111)
@@ -779,3 +767,78 @@ class CategoryFilterPage(QWidget):
     def showEvent(self, event):
         self.load_monthly_summary()
         super().showEvent(event)
+
+
+class SearchPage(QWidget):
+    """Records matching the search box text, best match first, matched words highlighted"""
+    def __init__(self, db: ExpDBManager, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.search_text = ""
+        self.setStyleSheet(UIDesign.CATEGORY_PAGE_BG)
+
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(10, 10, 10, 10)
+        self.main_layout.setSpacing(10)
+
+        self.label_title = QLabel("Search", self)
+        self.label_title.setStyleSheet(UIDesign.SEARCH_TITLE_LABEL_STYLE)
+        self.main_layout.addWidget(self.label_title)
+
+        self.scroll_area = QScrollArea(self)
+        self.scroll_area.setStyleSheet(UIDesign.CATEGORY_SCROLL_AREA_STYLE)
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_widget = QWidget()
+        self.scroll_layout = QVBoxLayout(self.scroll_widget)
+        self.scroll_layout.setContentsMargins(0, 0, 0, 0)
+        self.scroll_layout.setSpacing(10)
+        self.scroll_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.scroll_area.setWidget(self.scroll_widget)
+        self.main_layout.addWidget(self.scroll_area)
+
+        # results are added a chunk at a time as the query is read
+        self.stream = ResultStream(self.add_hit, self)
+        self.stream.finished.connect(self.on_search_finished)
+
+    def search(self, text):
+        self.search_text = text
+        self.stream.stop()
+        while self.scroll_layout.count():
+            item = self.scroll_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self.label_title.setText(f"Search: {text}")
+        self.stream.start(self.db.search_pay_data(text, start=MARK_START, end=MARK_END))
+
+    def add_hit(self, record, marked):
+        card = ExpenseCard(record, parent=self.scroll_widget)
+        for label, key in ((card.payee_label, "payee"), (card.comment_label, "comment")):
+            label.setTextFormat(Qt.TextFormat.RichText)
+            label.setText(marked_html(marked[key]))
+        card.mousePressEvent = lambda e, c=card: self.open_edit_dialog(c)
+        self.scroll_layout.addWidget(card)
+
+    def on_search_finished(self, count):
+        self.label_title.setText(f"Search: {self.search_text}   ({count} found)")
+
+    def open_edit_dialog(self, card):
+        old_data = card.record_data.copy()
+        dialog = AddExpenseDialog(self)
+        dialog.date_edit.setDate(QDate.fromString(old_data["date"], "yyyy-MM-dd"))
+        from PyQt6.QtCore import QTime
+        dialog.time_edit.setTime(QTime.fromString(old_data["time"], "HH:mm"))
+        dialog.method_combo.setCurrentText(old_data["method"])
+
+        original_amount = float(old_data["amount"])
+        dialog.amount_edit.setText(str(abs(original_amount)))
+        if original_amount < 0:
+            dialog.type_combo.setCurrentText("Expense")
+        else:
+            dialog.type_combo.setCurrentText("Income")
+
+        dialog.category_combo.setCurrentText(old_data["category"])
+        dialog.payee_edit.setText(old_data["payee"])
+        dialog.comment_edit.setPlainText(old_data["comment"])
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.db.update_pay_data(old_data["id"], dialog.get_data())
+            self.search(self.search_text)
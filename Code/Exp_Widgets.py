@@ -6,6 +6,14 @@ from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButt
 from PyQt6.QtCore import Qt, QDate
 from UIDesign import UIDesign
 
+CURRENCY_SYMBOLS = {"GBP": "£", "USD": "$", "EUR": "€"}
+
+def format_amount(amount, currency="GBP", signed=False) -> str:
+    """The one place record amounts (numbers from the database) become text"""
+    symbol = CURRENCY_SYMBOLS.get(currency, currency)
+    sign = "+" if signed and amount > 0 else ""
+    return f"{sign}{amount:.2f} {symbol}"
+
 class PieChart(QWidget):
     # this is a pie chart use in Month budget area
     def __init__(self, monthly_budget=500, left_budget=100, parent=None):
@@ -150,12 +158,9 @@ class ExpenseCard(QWidget):
         self.amount_label = QLabel(self)
         self.amount_label.setGeometry(620, 15, 80, 20)
         self.amount_label.setStyleSheet(UIDesign.EXPENSECARD_LABEL_STYLE)
-        amt = self.record_data.get("amount", "0")
         # show + when the amount is positive
-        if float(amt) > 0:
-            self.amount_label.setText(f" +{amt} £")
-        else:
-            self.amount_label.setText(f" {amt} £")
+        self.amount_label.setText(" " + format_amount(self.record_data.get("amount", 0),
+                                                      self.record_data.get("currency", "GBP"), signed=True))
 
         self.delete_btn = QPushButton("X", self)
         self.delete_btn.setGeometry(710, 15, 30, 20)
@@ -181,11 +186,8 @@ class ExpenseCard(QWidget):
         self.method_label.setText(self.record_data.get("method", "Card/Cash"))
         self.payee_label.setText(self.record_data.get("payee", "Name..."))
         self.comment_label.setText(self.record_data.get("comment", "Comments..."))
-        amt = self.record_data.get("amount", "0")
-        if float(amt) > 0:
-            self.amount_label.setText(f" +{amt} £")
-        else:
-            self.amount_label.setText(f" {amt} £")
+        self.amount_label.setText(" " + format_amount(self.record_data.get("amount", 0),
+                                                      self.record_data.get("currency", "GBP"), signed=True))
 
 # This is the widget to show data in All and category pages
 class MonthSummaryWidget(QWidget):
@@ -1,9 +1,25 @@
 import sqlite3
+import functools
 import os
 import sys
-from typing import List, Dict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ConnectionPool import close_shared, open_shared
+from QueryCache import query_cache
+from Records import PayRecord
+from TextSearch import fts_query
 
 DB_NAME = "expenses.db"  # database name
+SCHEMA_VERSION = 5  # stored in PRAGMA user_version, see _migrate
+# keys of a record dict, also the order of the values in a record tuple
+# (a tuple may add the currency as an eighth value)
+PAY_FIELDS = ("date", "time", "method", "amount", "category", "payee", "comment")
+# amounts are stored as integers in minor units (pence), sums are exact
+MINOR_UNITS = 100
+DEFAULT_CURRENCY = "GBP"
+# pay_data columns in PayRecord field order
+PAY_COLUMNS = "id, date, time, method, amount, currency, category, payerOrPayee, comment"
 
 def get_resource_path(relative_path):
     if getattr(sys, 'frozen', False):
@@ -12,12 +28,97 @@ def get_resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+def to_minor_units(amount) -> int:
+    """12.345 / "12.345" -> 1235, rounding half away from zero"""
+    return int((Decimal(str(amount)) * MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+
+def from_minor_units(value) -> float:
+    """1235 -> 12.35; None (an empty SUM) -> 0.0"""
+    return value / MINOR_UNITS if value else 0.0
+
+def pay_record(cursor, row) -> PayRecord:
+    """row_factory building PayRecords from "SELECT PAY_COLUMNS" rows"""
+    return PayRecord(row[0], row[1], row[2], row[3], from_minor_units(row[4]), row[5], row[6], row[7], row[8])
+
+def period_bounds(period: str) -> Tuple[str, str]:
+    """
+    "2025-03" -> ("2025-03", "2025-04"), "2025" -> ("2025", "2026").
+    Dates are stored as yyyy-MM-dd, so date >= start AND date < end selects the
+    period and, unlike LIKE or substr, can use the date indexes.
+    """
+    if len(period) == 4:
+        return period, f"{int(period) + 1:04d}"
+    year, month = int(period[:4]), int(period[5:7])
+    if month == 12:
+        return period, f"{year + 1:04d}-01"
+    return period, f"{year:04d}-{month + 1:02d}"
+
+def period_range(first: str, last: str) -> List[str]:
+    """
+    Every period from first to last inclusive, both months ("2024-11",
+    "2025-02" -> Nov, Dec, Jan, Feb) or both years ("2021", "2025").
+    """
+    if len(first) != len(last):
+        raise ValueError(f"{first!r} and {last!r} are not the same kind of period")
+    periods = []
+    period = first
+    while period <= last:
+        periods.append(period)
+        period = period_bounds(period)[1]
+    return periods
+
+def _fresh(value):
+    # a caller's own copy of the lists and dicts of a cached result; PayRecords
+    # and sqlite3.Rows are read-only, so they are shared
+    if isinstance(value, list):
+        return [_fresh(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _fresh(item) for key, item in value.items()}
+    return value
+
+def cached(method):
+    """
+    Read method whose results are kept in the manager's QueryCache, keyed by
+    the method (its query) and the arguments. Every caller gets its own copy
+    of the containers, so changing a result never changes the cached one.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        found, value = self.cache.get(key)
+        if found:
+            return _fresh(value)
+        generation = value
+        value = method(self, *args, **kwargs)
+        self.cache.put(key, generation, value)
+        return _fresh(value)
+    return wrapper
+
+def invalidates(method):
+    """Write method; afterwards (even if it failed half way) every cached read is dropped"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.cache.invalidate()
+    return wrapper
+
 class ExpDBManager:
-    def __init__(self):
-        db_path = get_resource_path(DB_NAME)
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row
-        self._create_tables()
+    def __init__(self, db_path=None):
+        db_path = db_path or get_resource_path(DB_NAME)
+        # one shared connection per file, the schema is checked when it is opened
+        self.conn, created = open_shared(db_path)
+        # read results, shared by all the managers of the file
+        self.cache = query_cache(db_path)
+        if created:
+            try:
+                self._create_tables()
+                self._migrate()
+            except sqlite3.Error:
+                # do not leave a half set up connection in the pool for the next manager
+                close_shared(db_path)
+                raise
 
     def _create_tables(self):
         c = self.conn.cursor()
@@ -41,6 +142,9 @@ class ExpDBManager:
             )
         """)
 
+        # holds one row while insert_pay_data_many writes a batch, see there
+        c.execute("CREATE TABLE IF NOT EXISTS bulk_import (active INTEGER)")
+
         # Categories Table, store the information and button
         c.execute("""
                     CREATE TABLE IF NOT EXISTS Categories (
@@ -58,55 +162,357 @@ class ExpDBManager:
             c.executemany("INSERT INTO Categories (category) VALUES (?)", initial_cats)
         self.conn.commit()
 
+    def _migrate(self):
+        """
+        Bring older databases up to SCHEMA_VERSION, one step at a time.
+        Version 1: generated year (yyyy) and month (yyyy-MM) columns, and indexes
+        on date and (category, date) for the period queries.
+        Version 2: the monthly_category_totals rollup, see _create_monthly_totals.
+        Version 3: amount as INTEGER minor units and a currency column; pay_data
+        is rebuilt (SQLite cannot change a column type) and the rollup with it.
+        Version 4: the pay_data_fts search index, see _create_search_index.
+        Version 5: the bulk_import flag table; the insert triggers of versions 2
+        and 4 are recreated to skip rows written by insert_pay_data_many.
+        All steps run in one explicit transaction: the sqlite3 module only opens
+        one implicitly before DML, and DDL outside a transaction autocommits.
+        A failed migration is rolled back completely and raised, the database
+        is not used with a half changed schema.
+        """
+        c = self.conn.cursor()
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if self.conn.in_transaction:
+            self.conn.commit()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if version < 1:
+                columns = {row["name"] for row in c.execute("PRAGMA table_xinfo(pay_data)")}
+                if "year" not in columns:
+                    c.execute("ALTER TABLE pay_data ADD COLUMN year TEXT GENERATED ALWAYS AS (substr(date, 1, 4)) VIRTUAL")
+                if "month" not in columns:
+                    c.execute("ALTER TABLE pay_data ADD COLUMN month TEXT GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL")
+                c.execute("CREATE INDEX IF NOT EXISTS idx_pay_data_date ON pay_data (date)")
+                c.execute("CREATE INDEX IF NOT EXISTS idx_pay_data_category_date ON pay_data (category, date)")
+            if version < 2:
+                self._create_monthly_totals(c)
+                self._rebuild_monthly_totals(c)
+            if version < 3:
+                self._migrate_minor_units(c)
+            if version < 4:
+                self._create_search_index(c)
+            if version < 5:
+                c.execute("DROP TRIGGER IF EXISTS pay_data_totals_insert")
+                c.execute("DROP TRIGGER IF EXISTS pay_data_fts_insert")
+                self._create_monthly_totals(c)
+                self._create_search_index(c, rebuild=False)
+            c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f"Error migrating expense database: {e}")
+            raise
+
+    def _migrate_minor_units(self, c):
+        row = c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'pay_data'").fetchone()
+        sequence = row["seq"] if row else 0
+        # left over by a failed migration before migrations were transactional
+        c.execute("DROP TABLE IF EXISTS pay_data_new")
+        c.execute(f"""
+            CREATE TABLE pay_data_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT,
+                time TEXT,
+                method TEXT,
+                amount INTEGER,
+                currency TEXT NOT NULL DEFAULT '{DEFAULT_CURRENCY}',
+                category TEXT,
+                payerOrPayee TEXT,
+                comment TEXT,
+                year TEXT GENERATED ALWAYS AS (substr(date, 1, 4)) VIRTUAL,
+                month TEXT GENERATED ALWAYS AS (substr(date, 1, 7)) VIRTUAL
+            )
+        """)
+        # amounts were rounded to 2 places on insert, so this only removes float error
+        c.execute(f"""
+            INSERT INTO pay_data_new (id, date, time, method, amount, category, payerOrPayee, comment)
+            SELECT id, date, time, method, CAST(round(amount * {MINOR_UNITS}) AS INTEGER),
+                   category, payerOrPayee, comment
+            FROM pay_data
+        """)
+        # dropping the table drops its indexes and triggers too
+        c.execute("DROP TABLE pay_data")
+        c.execute("ALTER TABLE pay_data_new RENAME TO pay_data")
+        c.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'pay_data'", (sequence,))
+        c.execute("CREATE INDEX IF NOT EXISTS idx_pay_data_date ON pay_data (date)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_pay_data_category_date ON pay_data (category, date)")
+        c.execute("DROP TABLE IF EXISTS monthly_category_totals")
+        self._create_monthly_totals(c)
+        self._rebuild_monthly_totals(c)
+
+    def _create_search_index(self, c, rebuild=True):
+        """
+        pay_data_fts is an FTS5 index of payerOrPayee and comment. It stores no
+        copy of the text (content=pay_data) and is kept in step by triggers.
+        Prefix indexes make the search-as-you-type prefix queries cheap; rank
+        is bm25 with a payee match worth twice a comment match.
+        """
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS pay_data_fts USING fts5(
+                payerOrPayee, comment,
+                content = 'pay_data', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        """)
+        c.execute("INSERT INTO pay_data_fts (pay_data_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS pay_data_fts_insert AFTER INSERT ON pay_data
+            WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+            BEGIN {self._INDEX_NEW} END
+        """)
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS pay_data_fts_delete AFTER DELETE ON pay_data BEGIN {self._UNINDEX_OLD} END")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS pay_data_fts_update
+            AFTER UPDATE OF payerOrPayee, comment ON pay_data
+            BEGIN {self._UNINDEX_OLD} {self._INDEX_NEW} END
+        """)
+        if rebuild:
+            c.execute("INSERT INTO pay_data_fts (pay_data_fts) VALUES ('rebuild')")
+
+    _INDEX_NEW = """
+            INSERT INTO pay_data_fts (rowid, payerOrPayee, comment)
+            VALUES (NEW.id, NEW.payerOrPayee, NEW.comment);
+    """
+    _UNINDEX_OLD = """
+            INSERT INTO pay_data_fts (pay_data_fts, rowid, payerOrPayee, comment)
+            VALUES ('delete', OLD.id, OLD.payerOrPayee, OLD.comment);
+    """
+
+    def _create_monthly_totals(self, c):
+        """
+        monthly_category_totals holds income, expense (positive, minor units) and
+        the record count per (month, category), kept up to date by triggers on pay_data, so
+        the summary reads cost O(months x categories) instead of O(records).
+        A NULL date or category is stored as ''.
+        """
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                month TEXT NOT NULL,
+                category TEXT NOT NULL,
+                income INTEGER NOT NULL DEFAULT 0,
+                expense INTEGER NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (month, category)
+            ) WITHOUT ROWID
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_monthly_totals_category ON monthly_category_totals (category, month)")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS pay_data_totals_insert AFTER INSERT ON pay_data
+            WHEN NOT EXISTS (SELECT 1 FROM bulk_import)
+            BEGIN {self._ADD_NEW} END
+        """)
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS pay_data_totals_delete AFTER DELETE ON pay_data BEGIN {self._REMOVE_OLD} END")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS pay_data_totals_update
+            AFTER UPDATE OF date, amount, category ON pay_data
+            BEGIN {self._REMOVE_OLD} {self._ADD_NEW} END
+        """)
+
+    # trigger bodies adding NEW to / removing OLD from the rollup
+    _ADD_NEW = """
+            INSERT INTO monthly_category_totals (month, category, income, expense, count)
+            VALUES (IFNULL(substr(NEW.date, 1, 7), ''), IFNULL(NEW.category, ''),
+                    CASE WHEN NEW.amount > 0 THEN NEW.amount ELSE 0 END,
+                    CASE WHEN NEW.amount < 0 THEN -NEW.amount ELSE 0 END, 1)
+            ON CONFLICT (month, category) DO UPDATE SET
+                income = income + excluded.income,
+                expense = expense + excluded.expense,
+                count = count + 1;
+    """
+    _REMOVE_OLD = """
+            UPDATE monthly_category_totals SET
+                income = income - CASE WHEN OLD.amount > 0 THEN OLD.amount ELSE 0 END,
+                expense = expense - CASE WHEN OLD.amount < 0 THEN -OLD.amount ELSE 0 END,
+                count = count - 1
+            WHERE month = IFNULL(substr(OLD.date, 1, 7), '') AND category = IFNULL(OLD.category, '');
+            DELETE FROM monthly_category_totals
+            WHERE month = IFNULL(substr(OLD.date, 1, 7), '') AND category = IFNULL(OLD.category, '')
+                  AND count <= 0;
+    """
+
+    # aggregate of pay_data in the shape of monthly_category_totals
+    _TOTALS_FROM_PAY_DATA = """
+        SELECT IFNULL(substr(date, 1, 7), '') AS month, IFNULL(category, '') AS category,
+               SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS income,
+               -SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS expense,
+               COUNT(*) AS count
+        FROM pay_data {where}
+        GROUP BY 1, 2
+    """
+
+    def _rebuild_monthly_totals(self, c):
+        c.execute("DELETE FROM monthly_category_totals")
+        c.execute("INSERT INTO monthly_category_totals (month, category, income, expense, count) "
+                  + self._TOTALS_FROM_PAY_DATA.format(where=""))
+
+    @invalidates
+    def rebuild_monthly_totals(self):
+        """Recompute the rollup from pay_data, e.g. after editing the file by hand"""
+        c = self.conn.cursor()
+        self._rebuild_monthly_totals(c)
+        self.conn.commit()
+
+    def verify_monthly_totals(self) -> List[Dict]:
+        """
+        Compare the rollup with a fresh aggregate of pay_data; returns the
+        (month, category) rows that differ, an empty list when in sync.
+        """
+        c = self.conn.cursor()
+        c.execute(f"""
+            WITH fresh AS ({self._TOTALS_FROM_PAY_DATA.format(where="")})
+            SELECT month, category, f.income AS expected_income, t.income AS income,
+                   f.expense AS expected_expense, t.expense AS expense,
+                   f.count AS expected_count, t.count AS count
+            FROM fresh f LEFT JOIN monthly_category_totals t USING (month, category)
+            WHERE t.count IS NOT f.count OR t.income IS NOT f.income OR t.expense IS NOT f.expense
+            UNION ALL
+            SELECT month, category, NULL, t.income, NULL, t.expense, NULL, t.count
+            FROM monthly_category_totals t LEFT JOIN fresh f USING (month, category)
+            WHERE f.count IS NULL
+        """)
+        return [dict(row) for row in c.fetchall()]
+
+    @invalidates
     def insert_pay_data(self, data: Dict) -> int:
         c = self.conn.cursor()
         c.execute("""
-            INSERT INTO pay_data (date, time, method, amount, category, payerOrPayee, comment)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data["date"],
-            data["time"],
-            data["method"],
-            round(float(data["amount"]),2),
-            data["category"],
-            data["payee"],
-            data["comment"]
-        ))
+            INSERT INTO pay_data (date, time, method, amount, category, payerOrPayee, comment, currency)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, self._pay_values(data))
         self.conn.commit()
         return c.lastrowid
 
+    @invalidates
     def update_pay_data(self, record_id: int, data: Dict):
+        # data without a currency (e.g. from AddExpenseDialog) keeps the stored one
         c = self.conn.cursor()
         c.execute("""
             UPDATE pay_data
-            SET date = ?, time = ?, method = ?, amount = ?, category = ?, payerOrPayee = ?, comment = ?
+            SET date = ?, time = ?, method = ?, amount = ?, category = ?, payerOrPayee = ?, comment = ?,
+                currency = IFNULL(?, currency)
             WHERE id = ?
-        """, (
-            data["date"],
-            data["time"],
-            data["method"],
-            float(data["amount"]),
-            data["category"],
-            data["payee"],
-            data["comment"],
-            record_id
-        ))
+        """, (*self._pay_values(data, None), record_id))
         self.conn.commit()
 
+    @invalidates
     def delete_pay_data(self, record_id: int):
         c = self.conn.cursor()
         c.execute("DELETE FROM pay_data WHERE id = ?", (record_id,))
         self.conn.commit()
 
+    @staticmethod
+    def _pay_values(data, default_currency=DEFAULT_CURRENCY) -> tuple:
+        # a record dict or tuple (in PAY_FIELDS order, currency optional) -> column values;
+        # updates pass default_currency=None so a missing currency is left unchanged
+        if isinstance(data, dict):
+            currency = data.get("currency") or default_currency
+            data = [data[key] for key in PAY_FIELDS]
+        elif len(data) > len(PAY_FIELDS):
+            currency = data[len(PAY_FIELDS)] or default_currency
+            data = data[:len(PAY_FIELDS)]
+        else:
+            currency = default_currency
+        date, time, method, amount, category, payee, comment = data
+        return date, time, method, to_minor_units(amount), category, payee, comment, currency
+
+    @invalidates
+    def insert_pay_data_many(self, records: Iterable) -> range:
+        """
+        Insert record dicts or tuples in one transaction. records may be a
+        generator, it is consumed as the rows are written. Returns the new ids;
+        they are consecutive, so this is a range rather than a list.
+
+        While the batch is written bulk_import holds a row, which the insert
+        triggers check and skip their per-row work; the monthly totals get the
+        batch's grouped sums and the search index its rows in one statement
+        each instead. The row only exists inside this write transaction, so
+        other connections never see it, and the schema is not touched.
+        """
+        count = 0
+
+        def values():
+            nonlocal count
+            for data in records:
+                count += 1
+                yield self._pay_values(data)
+
+        with self.conn:
+            c = self.conn.cursor()
+            if not self.conn.in_transaction:
+                c.execute("BEGIN IMMEDIATE")
+            c.execute("INSERT INTO bulk_import (active) VALUES (1)")
+            c.executemany("""
+                INSERT INTO pay_data (date, time, method, amount, category, payerOrPayee, comment, currency)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, values())
+            last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            ids = range(last_id - count + 1, last_id + 1) if count else range(0)
+            if count:
+                c.execute(f"""
+                    INSERT INTO monthly_category_totals (month, category, income, expense, count)
+                    {self._TOTALS_FROM_PAY_DATA.format(where="WHERE id BETWEEN ? AND ?")}
+                    ON CONFLICT (month, category) DO UPDATE SET
+                        income = income + excluded.income,
+                        expense = expense + excluded.expense,
+                        count = count + excluded.count
+                """, (ids.start, ids.stop - 1))
+                c.execute("""
+                    INSERT INTO pay_data_fts (rowid, payerOrPayee, comment)
+                    SELECT id, payerOrPayee, comment FROM pay_data WHERE id BETWEEN ? AND ?
+                """, (ids.start, ids.stop - 1))
+            c.execute("DELETE FROM bulk_import")
+        return ids
+
+    @invalidates
+    def update_many(self, records: Iterable) -> int:
+        """
+        Update records in one transaction. Items are (record_id, data) pairs or
+        dicts with an "id" key; a record without a currency keeps its stored one.
+        Returns the number of rows changed.
+        """
+        def values():
+            for item in records:
+                if isinstance(item, dict):
+                    record_id, data = item["id"], item
+                else:
+                    record_id, data = item
+                yield (*self._pay_values(data, None), record_id)
+
+        with self.conn:
+            c = self.conn.cursor()
+            c.executemany("""
+                UPDATE pay_data
+                SET date = ?, time = ?, method = ?, amount = ?, category = ?, payerOrPayee = ?, comment = ?,
+                    currency = IFNULL(?, currency)
+                WHERE id = ?
+            """, values())
+            return c.rowcount
+
+    @invalidates
+    def delete_many(self, record_ids: Iterable[int]) -> int:
+        """Delete records by id in one transaction; returns the number of rows deleted"""
+        with self.conn:
+            c = self.conn.cursor()
+            c.executemany("DELETE FROM pay_data WHERE id = ?", ((record_id,) for record_id in record_ids))
+            return c.rowcount
+
+    @cached
     def fetch_all_months_with_stats_by_category(self, category: str) -> List[dict]:
         c = self.conn.cursor()
         c.execute("""
-            SELECT substr(date, 1, 7) AS month,
-                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_income,
-                   ABS(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END)) AS total_expense
-            FROM pay_data
+            SELECT month, income AS total_income, expense AS total_expense
+            FROM monthly_category_totals
             WHERE category = ?
-            GROUP BY substr(date, 1, 7)
             ORDER BY month DESC
         """, (category,))
         rows = c.fetchall()
@@ -114,34 +520,24 @@ class ExpDBManager:
         for row in rows:
             result.append({
                 "month": row["month"],
-                "income": row["total_income"] or 0,
-                "expense": row["total_expense"] or 0
+                "income": from_minor_units(row["total_income"]),
+                "expense": from_minor_units(row["total_expense"])
             })
         return result
 
-    def fetch_pay_data_by_date(self, date: str) -> List[Dict]:
+    @cached
+    def fetch_pay_data_by_date(self, date: str) -> List[PayRecord]:
         c = self.conn.cursor()
-        c.execute("""
-            SELECT id, date, time, method, amount, category, payerOrPayee, comment
+        c.row_factory = pay_record
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
             FROM pay_data
             WHERE date = ?
             ORDER BY time ASC
         """, (date,))
-        rows = c.fetchall()
-        result = []
-        for row in rows:
-            result.append({
-                "id": row["id"],
-                "date": row["date"],
-                "time": row["time"],
-                "method": row["method"],
-                "amount": str(row["amount"]),
-                "category": row["category"],
-                "payee": row["payerOrPayee"],
-                "comment": row["comment"]
-            })
-        return result
+        return c.fetchall()
 
+    @cached
     def get_daily_statistics(self, date: str) -> Dict:
         c = self.conn.cursor()
         c.execute("""
@@ -153,25 +549,25 @@ class ExpDBManager:
         """, (date,))
         row = c.fetchone()
         return {
-            "income": row["total_income"] if row["total_income"] is not None else 0,
-            "expense": abs(row["total_expense"]) if row["total_expense"] is not None else 0
+            "income": from_minor_units(row["total_income"]),
+            "expense": abs(from_minor_units(row["total_expense"]))
         }
 
+    @cached
     def get_monthly_statistics(self, month: str) -> Dict:
         c = self.conn.cursor()
         c.execute("""
-            SELECT
-                SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_income,
-                SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS total_expense
-            FROM pay_data
-            WHERE date LIKE ?
-        """, (month + "%",))
+            SELECT SUM(income) AS total_income, -SUM(expense) AS total_expense
+            FROM monthly_category_totals
+            WHERE month = ?
+        """, (month,))
         row = c.fetchone()
         return {
-            "income": row["total_income"] if row["total_income"] is not None else 0,
-            "expense": abs(row["total_expense"]) if row["total_expense"] is not None else 0
+            "income": from_minor_units(row["total_income"]),
+            "expense": abs(from_minor_units(row["total_expense"]))
         }
 
+    @cached
     def get_budget_for_month(self, month: str) -> float:
         first_day = month + "-01"
         c = self.conn.cursor()
@@ -181,6 +577,7 @@ class ExpDBManager:
             return float(row["budget"])
         return 0.0
 
+    @invalidates
     def set_budget_for_month(self, month: str, budget: float):
         first_day = month + "-01"
         c = self.conn.cursor()
@@ -192,11 +589,13 @@ class ExpDBManager:
             c.execute("INSERT INTO Budget (date, budget) VALUES (?, ?)", (first_day, budget))
         self.conn.commit()
 
+    @invalidates
     def delete_old_pay_data(self, cutoff_date: str):
         c = self.conn.cursor()
         c.execute("DELETE FROM pay_data WHERE date < ?", (cutoff_date,))
         self.conn.commit()
 
+    @cached
     def fetch_all_months_with_stats(self) -> List[dict]:
         """
         return like：
@@ -208,11 +607,9 @@ class ExpDBManager:
         """
         c = self.conn.cursor()
         c.execute("""
-            SELECT substr(date, 1, 7) AS month,
-                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_income,
-                   ABS(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END)) AS total_expense
-            FROM pay_data
-            GROUP BY substr(date, 1, 7)
+            SELECT month, SUM(income) AS total_income, SUM(expense) AS total_expense
+            FROM monthly_category_totals
+            GROUP BY month
             ORDER BY month DESC
         """)
         rows = c.fetchall()
@@ -220,90 +617,179 @@ class ExpDBManager:
         for row in rows:
             result.append({
                 "month": row["month"],  # "yyyy-MM"
-                "income": row["total_income"] or 0,  # avoid None
-                "expense": row["total_expense"] or 0
+                "income": from_minor_units(row["total_income"]),  # avoid None
+                "expense": from_minor_units(row["total_expense"])
             })
         return result
 
-    def fetch_pay_data_by_category(self, category_name: str):
+    @cached
+    def fetch_pay_data_by_category(self, category_name: str) -> List[PayRecord]:
         c = self.conn.cursor()
-        c.execute("""
-            SELECT id, date, time, method, amount, category, payerOrPayee, comment
+        c.row_factory = pay_record
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
             FROM pay_data
             WHERE category = ?
             ORDER BY date DESC, time DESC
         """, (category_name,))
-        rows = c.fetchall()
-        result = []
-        for row in rows:
-            result.append({
-                "id": row["id"],
-                "date": row["date"],
-                "time": row["time"],
-                "method": row["method"],
-                "amount": str(row["amount"]),
-                "category": row["category"],
-                "payee": row["payerOrPayee"],
-                "comment": row["comment"]
-            })
-        return result
+        return c.fetchall()
 
-    def fetch_pay_data_by_month(self, month_str: str) -> List[Dict]:
+    @cached
+    def fetch_pay_data_by_month(self, month_str: str) -> List[PayRecord]:
         """
         month_str like "2025-03"
         return all data this month
         """
         c = self.conn.cursor()
-        c.execute("""
-            SELECT id, date, time, method, amount, category, payerOrPayee, comment
+        c.row_factory = pay_record
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
             FROM pay_data
-            WHERE date LIKE ?
+            WHERE date >= ? AND date < ?
             ORDER BY date ASC, time ASC
-        """, (month_str + "%",))
-        rows = c.fetchall()
-        result = []
-        for row in rows:
-            result.append({
-                "id": row["id"],
-                "date": row["date"],
-                "time": row["time"],
-                "method": row["method"],
-                "amount": str(row["amount"]),
-                "category": row["category"],
-                "payee": row["payerOrPayee"],
-                "comment": row["comment"]
-            })
-        return result
+        """, period_bounds(month_str))
+        return c.fetchall()
 
-    def fetch_pay_data_by_month_and_category(self, month_str: str, category: str) -> List[Dict]:
+    @cached
+    def fetch_pay_data_by_month_and_category(self, month_str: str, category: str) -> List[PayRecord]:
         c = self.conn.cursor()
-        c.execute("""
-            SELECT id, date, time, method, amount, category, payerOrPayee, comment
+        c.row_factory = pay_record
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
             FROM pay_data
-            WHERE date LIKE ? AND category = ?
+            WHERE category = ? AND date >= ? AND date < ?
             ORDER BY date ASC, time ASC
-        """, (month_str + "%", category))
-        rows = c.fetchall()
-        result = []
-        for row in rows:
-            result.append({
-                "id": row["id"],
-                "date": row["date"],
-                "time": row["time"],
-                "method": row["method"],
-                "amount": str(row["amount"]),
-                "category": row["category"],
-                "payee": row["payerOrPayee"],
-                "comment": row["comment"]
-            })
-        return result
+        """, (category, *period_bounds(month_str)))
+        return c.fetchall()
 
+    # Streaming and paging. The fetch_* methods above return whole lists; these
+    # pull rows as they are used. A page_* call takes the page_key of the last
+    # record of the previous page (None for the first page), which the query
+    # seeks to through the indexes instead of skipping rows with OFFSET.
+
+    @staticmethod
+    def page_key(record: PayRecord) -> Tuple[str, str, int]:
+        return record.date, record.time, record.id
+
+    def _iter_records(self, sql, params, batch_size) -> Iterator[PayRecord]:
+        c = self.conn.cursor()
+        c.row_factory = pay_record
+        c.execute(sql, params)
+        while True:
+            batch = c.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    def iter_pay_data_by_category(self, category_name: str, batch_size: int = 200) -> Iterator[PayRecord]:
+        """Like fetch_pay_data_by_category (newest first), read batch_size rows at a time"""
+        return self._iter_records(f"""
+            SELECT {PAY_COLUMNS}
+            FROM pay_data
+            WHERE category = ?
+            ORDER BY date DESC, time DESC, id DESC
+        """, (category_name,), batch_size)
+
+    def iter_pay_data_by_month(self, month_str: str, batch_size: int = 200) -> Iterator[PayRecord]:
+        """Like fetch_pay_data_by_month (oldest first), read batch_size rows at a time"""
+        return self._iter_records(f"""
+            SELECT {PAY_COLUMNS}
+            FROM pay_data
+            WHERE date >= ? AND date < ?
+            ORDER BY date ASC, time ASC, id ASC
+        """, period_bounds(month_str), batch_size)
+
+    @cached
+    def page_pay_data_by_category(self, category_name: str, after_key: Optional[Tuple] = None,
+                                  limit: int = 50) -> List[PayRecord]:
+        """Up to limit records of a category older than after_key, newest first"""
+        c = self.conn.cursor()
+        c.row_factory = pay_record
+        if after_key is None:
+            after_key = ("9999", "", 0)
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
+            FROM pay_data
+            WHERE category = ? AND date <= ? AND (date, time, id) < (?, ?, ?)
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        """, (category_name, after_key[0], *after_key, limit))
+        return c.fetchall()
+
+    @cached
+    def page_pay_data_by_month(self, month_str: str, after_key: Optional[Tuple] = None,
+                               limit: int = 50) -> List[PayRecord]:
+        """Up to limit records of a month newer than after_key, oldest first"""
+        start, end = period_bounds(month_str)
+        if after_key is None:
+            after_key = (start, "", 0)
+        c = self.conn.cursor()
+        c.row_factory = pay_record
+        c.execute(f"""
+            SELECT {PAY_COLUMNS}
+            FROM pay_data
+            WHERE date >= ? AND date < ? AND (date, time, id) > (?, ?, ?)
+            ORDER BY date ASC, time ASC, id ASC
+            LIMIT ?
+        """, (max(start, after_key[0]), end, *after_key, limit))
+        return c.fetchall()
+
+    @cached
+    def exists_pay_data_in_category(self, category_name: str) -> bool:
+        """Whether a category has any record; stops at the first index entry"""
+        c = self.conn.cursor()
+        c.execute("SELECT EXISTS (SELECT 1 FROM pay_data WHERE category = ?)", (category_name,))
+        return bool(c.fetchone()[0])
+
+    @cached
+    def count_pay_data_by_category(self, category_name: str) -> int:
+        # from the monthly rollup, one row per month instead of one per record
+        c = self.conn.cursor()
+        c.execute("SELECT SUM(count) FROM monthly_category_totals WHERE category = ?", (category_name,))
+        return c.fetchone()[0] or 0
+
+    @cached
+    def count_pay_data_by_month(self, month_str: str) -> int:
+        c = self.conn.cursor()
+        c.execute("SELECT SUM(count) FROM monthly_category_totals WHERE month = ?", (month_str,))
+        return c.fetchone()[0] or 0
+
+    def search_pay_data(self, text: str, limit: int = 100, start: str = "[", end: str = "]",
+                        batch_size: int = 20) -> Iterator[Tuple[PayRecord, Dict[str, str]]]:
+        """
+        Records whose payee or comment match the words of text (each as a
+        prefix, see fts_query), best match first. Yields (record, marked) pairs
+        as they are read; marked holds the payee and a snippet of the comment
+        with the matching words between start and end.
+        """
+        query = fts_query(text)
+        if query is None:
+            return
+        c = self.conn.cursor()
+        c.row_factory = None
+        c.execute(f"""
+            SELECT {", ".join("p." + column for column in PAY_COLUMNS.split(", "))},
+                   highlight(pay_data_fts, 0, ?, ?), snippet(pay_data_fts, 1, ?, ?, '…', 12)
+            FROM pay_data_fts JOIN pay_data p ON p.id = pay_data_fts.rowid
+            WHERE pay_data_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """, (start, end, start, end, query, limit))
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield pay_record(c, row), {"payee": row[9] or "", "comment": row[10] or ""}
+
+    @cached
     def get_categories(self) -> List[Dict]:
         c = self.conn.cursor()
         c.execute("SELECT id, category FROM Categories ORDER BY id ASC")
         rows = c.fetchall()
         return [{"id": row["id"], "category": row["category"]} for row in rows]
 
+    @invalidates
     def insert_category(self, category: str) -> int:
         c = self.conn.cursor()
         # check duplicated elements
@@ -316,11 +802,13 @@ class ExpDBManager:
         self.conn.commit()
         return c.lastrowid
 
+    @invalidates
     def delete_category(self, category_id: int):
         c = self.conn.cursor()
         c.execute("DELETE FROM Categories WHERE id = ?", (category_id,))
         self.conn.commit()
 
+    @cached
     def get_category_net_by_month(self, month_str: str):
         """
         return a list, show this month's total net (expense + income)
@@ -332,38 +820,38 @@ class ExpDBManager:
         """
         c = self.conn.cursor()
         c.execute("""
-            SELECT category, SUM(amount) as net
-            FROM pay_data
-            WHERE date LIKE ?
+            SELECT category, SUM(income) - SUM(expense) as net
+            FROM monthly_category_totals
+            WHERE month = ?
             GROUP BY category
-        """, (month_str + "%",))
+        """, (month_str,))
         rows = c.fetchall()
         result = []
         for r in rows:
             cat = r["category"]
-            net_val = r["net"] if r["net"] else 0
-            result.append({"category": cat, "net": float(net_val)})
+            result.append({"category": cat, "net": from_minor_units(r["net"])})
         return result
 
+    @cached
     def get_category_net_by_year(self, year_str: str):
         """
         return a list, show this year's total net (expense + income)
         """
         c = self.conn.cursor()
         c.execute("""
-            SELECT category, SUM(amount) as net
-            FROM pay_data
-            WHERE substr(date,1,4) = ?
+            SELECT category, SUM(income) - SUM(expense) as net
+            FROM monthly_category_totals
+            WHERE month >= ? AND month < ?
             GROUP BY category
-        """, (year_str,))
+        """, period_bounds(year_str))
         rows = c.fetchall()
         result = []
         for r in rows:
             cat = r["category"]
-            net_val = r["net"] if r["net"] else 0
-            result.append({"category": cat, "net": float(net_val)})
+            result.append({"category": cat, "net": from_minor_units(r["net"])})
         return result
 
+    @cached
     def get_expense_by_category_by_month(self, month_str: str):
         """
         return a list, show this month's expense(<0) by category, and get its absolute value
@@ -372,54 +860,129 @@ class ExpDBManager:
         """
         c = self.conn.cursor()
         c.execute("""
-            SELECT category, ABS(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END)) AS expense
-            FROM pay_data
-            WHERE date LIKE ?
+            SELECT category, SUM(expense) AS expense
+            FROM monthly_category_totals
+            WHERE month = ?
             GROUP BY category
-        """, (month_str + "%",))
+        """, (month_str,))
         rows = c.fetchall()
         result = []
         for r in rows:
             if r["expense"] is not None and r["expense"] > 0:
-                result.append({"category": r["category"], "expense": float(r["expense"])})
+                result.append({"category": r["category"], "expense": from_minor_units(r["expense"])})
         return result
 
+    @cached
     def get_expense_by_category_by_year(self, year_str: str):
         """
         return a list, show this year's expense(<0) by category, and get its absolute value
         """
         c = self.conn.cursor()
         c.execute("""
-            SELECT category, ABS(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END)) AS expense
-            FROM pay_data
-            WHERE substr(date,1,4) = ?
+            SELECT category, SUM(expense) AS expense
+            FROM monthly_category_totals
+            WHERE month >= ? AND month < ?
             GROUP BY category
-        """, (year_str,))
+        """, period_bounds(year_str))
         rows = c.fetchall()
         result = []
         for r in rows:
             if r["expense"] is not None and r["expense"] > 0:
-                result.append({"category": r["category"], "expense": float(r["expense"])})
+                result.append({"category": r["category"], "expense": from_minor_units(r["expense"])})
         return result
 
+    @cached
     def get_yearly_statistics(self, year: str) -> dict:
         c = self.conn.cursor()
         c.execute("""
-            SELECT
-                SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_income,
-                SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS total_expense
-            FROM pay_data
-            WHERE substr(date, 1, 4) = ?
-        """, (year,))
+            SELECT SUM(income) AS total_income, -SUM(expense) AS total_expense
+            FROM monthly_category_totals
+            WHERE month >= ? AND month < ?
+        """, period_bounds(year))
         row = c.fetchone()
         return {
-            "income": row["total_income"] if row["total_income"] is not None else 0,
-            "expense": abs(row["total_expense"]) if row["total_expense"] is not None else 0
+            "income": from_minor_units(row["total_income"]),
+            "expense": abs(from_minor_units(row["total_expense"]))
         }
 
-    def close(self):
-        self.conn.close()
+    def get_period_statistics(self, periods: Sequence[str]) -> List[Dict]:
+        """
+        Income and expense of each period, all months (yyyy-MM) or all years
+        (yyyy), in the order given: [{"period", "income", "expense"}, ...].
+        One grouped query over the monthly totals whatever the number of
+        periods; periods without records give 0.0.
+        """
+        periods = tuple(periods)
+        if not periods:
+            return []
+        totals = self._period_totals(periods)
+        result = []
+        for period in periods:
+            income, expense = totals.get(period, (0.0, 0.0))
+            result.append({"period": period, "income": income, "expense": expense})
+        return result
 
+    def get_period_statistics_range(self, first: str, last: str) -> List[Dict]:
+        """get_period_statistics for every month or year from first to last"""
+        return self.get_period_statistics(period_range(first, last))
 
+    @cached
+    def _period_totals(self, periods: Tuple[str, ...]) -> Dict[str, Tuple[float, float]]:
+        width = len(periods[0])
+        if any(len(period) != width for period in periods):
+            raise ValueError("periods must be all months or all years")
+        # the month range bounds the primary key search, IN picks the periods
+        c = self.conn.cursor()
+        c.execute(f"""
+            SELECT substr(month, 1, {width}) AS period, SUM(income) AS income, SUM(expense) AS expense
+            FROM monthly_category_totals
+            WHERE month >= ? AND month < ? AND period IN ({", ".join("?" * len(periods))})
+            GROUP BY period
+        """, (min(periods), period_bounds(max(periods))[1], *periods))
+        return {row["period"]: (from_minor_units(row["income"]), from_minor_units(row["expense"]))
+                for row in c.fetchall()}
+
+    @cached
+    def get_years(self) -> List[str]:
+        """All years with records, newest first"""
+        # from the monthly rollup (one row per month and category), not a scan of pay_data
+        c = self.conn.cursor()
+        c.execute("""
+            SELECT DISTINCT substr(month, 1, 4) AS year
+            FROM monthly_category_totals
+            WHERE month != ''
+            ORDER BY year DESC
+        """)
+        return [row["year"] for row in c.fetchall()]
 
+    def cache_stats(self) -> Dict:
+        """Hits, misses, hit_rate, evictions, entries and generation of the read cache"""
+        return self.cache.stats()
 
+    def explain(self, sql: str, params=()) -> List[str]:
+        """The query plan of sql as text lines, for checking index use"""
+        c = self.conn.cursor()
+        c.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row["detail"] for row in c.fetchall()]
+
+    def close(self):
+        # the connection is shared with the other managers, ConnectionPool closes it at exit
+        self.conn = None
+
+if __name__ == "__main__":
+    # python Expdb_manager.py [verify|rebuild] [db]
+    #   verify / rebuild: compare / recompute the monthly totals of the db
+    #   (the query plans are checked by tests/test_query_plans.py)
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    manager = ExpDBManager(sys.argv[2] if len(sys.argv) > 2 else None)
+    if command == "rebuild":
+        manager.rebuild_monthly_totals()
+        print("Monthly totals rebuilt")
+    elif command == "verify":
+        differences = manager.verify_monthly_totals()
+        for row in differences:
+            print(row)
+        print(f"{len(differences)} monthly totals differ from pay_data")
+        manager.close()
+        sys.exit(1 if differences else 0)
+    manager.close()
\ No newline at end of file
@@ -2,9 +2,10 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QMainWindow, QWidget, QPushButton, QStackedWidget, QLabel, QScrollArea, QButtonGroup, \
     QVBoxLayout, QDialog
 from Exp_Dialogs import CategoryEditDialog
-from Exp_Pages import TodayPage, AllPage, SummaryPage, CategoryFilterPage
+from Exp_Pages import TodayPage, AllPage, SummaryPage, CategoryFilterPage, SearchPage
 from Exp_Widgets import CategoryButton
 from Expdb_manager import ExpDBManager
+from SearchBox import SearchBox
 from UIDesign import UIDesign
 
 class ExpenditurePage(QMainWindow):
@@ -40,6 +41,11 @@ class ExpenditurePage(QMainWindow):
         self.leftButtonGroup.addButton(self.All_btn)
         self.leftButtonGroup.addButton(self.Summary_btn)
 
+        # search payee and comment as you type
+        self.search_box = SearchBox(self.left_panel)
+        self.search_box.setGeometry(10, 166, 160, 28)
+        self.search_box.search_changed.connect(self.on_search_changed)
+
         # category
         self.cat_label = QLabel("Category", self.left_panel)
         self.cat_label.setGeometry(10, 200, 160, 30)
@@ -87,6 +93,15 @@ class ExpenditurePage(QMainWindow):
         self.Today_btn.clicked.connect(lambda: self.pages_widget.setCurrentIndex(0))
         self.All_btn.clicked.connect(lambda: self.pages_widget.setCurrentIndex(1))
         self.Summary_btn.clicked.connect(lambda: self.pages_widget.setCurrentIndex(2))
+        self.Search_page = SearchPage(self.db)
+        self.pages_widget.addWidget(self.Search_page)
+
+    def on_search_changed(self, text):
+        if text:
+            self.Search_page.search(text)
+            self.pages_widget.setCurrentWidget(self.Search_page)
+        elif self.pages_widget.currentWidget() is self.Search_page:
+            self.pages_widget.setCurrentIndex(0)
 
     def toggle_category_delete_mode(self):
         self.category_delete_mode = not self.category_delete_mode
@@ -155,8 +170,7 @@ class ExpenditurePage(QMainWindow):
             return
 
         # check if there are records
-        records = self.db.fetch_pay_data_by_category(category_name)
-        if records:
+        if self.db.exists_pay_data_in_category(category_name):
             from PyQt6.QtWidgets import QMessageBox
             QMessageBox.warning(self, "Can not delete.", "There are datas in this category, please manage them first！")
             return
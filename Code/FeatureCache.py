@@ -0,0 +1,187 @@
+import copy
+import os
+import sys
+import threading
+from urllib.request import urlopen
+
+import numpy as np
+from matplotlib.path import Path
+
+# Natural Earth layers drawn by the map: name -> (category, NE name, polygons?)
+MAP_FEATURES = {
+    "coastline": ("physical", "coastline", False),
+    "land": ("physical", "land", True),
+    "ocean": ("physical", "ocean", True),
+}
+# simplification tolerances (degrees) a cache file is built for; a map uses
+# the nearest one to half a pixel, so window sizes, quality tiers and HiDPI
+# screens share these few files instead of each needing its own
+TOLERANCES = (0.1, 0.2, 0.4)
+# seconds a missing shapefile may take to download (cartopy sets no timeout),
+# after that the map falls back to another cache file or goes without the layer
+DOWNLOAD_TIMEOUT = 10
+
+def get_resource_path(relative_path):
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def _ring_path(coords, closed):
+    # one MOVETO, LINETOs, and CLOSEPOLY on the repeated last vertex of a ring
+    coords = np.asarray(coords, dtype=np.float32)[:, :2]
+    codes = np.full(len(coords), Path.LINETO, dtype=np.uint8)
+    codes[0] = Path.MOVETO
+    if closed:
+        codes[-1] = Path.CLOSEPOLY
+    return coords, codes
+
+def _geometry_paths(geometry, polygons):
+    # flatten (multi)polygons into rings and (multi)lines into parts
+    parts = getattr(geometry, "geoms", [geometry])
+    for part in parts:
+        if part.is_empty:
+            continue
+        if polygons:
+            if len(part.exterior.coords) < 3:
+                continue
+            yield _ring_path(part.exterior.coords, True)
+            for interior in part.interiors:
+                if len(interior.coords) >= 3:
+                    yield _ring_path(interior.coords, True)
+        elif len(part.coords) >= 2:
+            yield _ring_path(part.coords, False)
+
+def _shapefile_path(scale, category, name):
+    # cartopy's shapereader.natural_earth(), downloading with DOWNLOAD_TIMEOUT
+    from cartopy import config
+    from cartopy.io import Downloader
+    downloader = copy.copy(Downloader.from_config(("shapefiles", "natural_earth", scale, category, name)))
+    downloader._urlopen = lambda url: urlopen(url, timeout=DOWNLOAD_TIMEOUT)
+    return downloader.path({"config": config, "category": category, "name": name, "resolution": scale})
+
+def _read_feature(scale, category, name, polygons, tolerance):
+    # the only place shapefiles are parsed (and downloaded if missing)
+    from cartopy.io import shapereader
+    path = _shapefile_path(scale, category, name)
+    vertices = []
+    codes = []
+    for geometry in shapereader.Reader(path).geometries():
+        if tolerance:
+            geometry = geometry.simplify(tolerance, preserve_topology=polygons)
+        for part_vertices, part_codes in _geometry_paths(geometry, polygons):
+            vertices.append(part_vertices)
+            codes.append(part_codes)
+    if not vertices:
+        return np.empty((0, 2), dtype=np.float32), np.empty(0, dtype=np.uint8)
+    return np.concatenate(vertices), np.concatenate(codes)
+
+
+class FeatureCache:
+    """
+    Natural Earth coastline/land/ocean as ready matplotlib paths in lon/lat.
+    Shapefiles are read once per scale and tolerance (one of TOLERANCES),
+    simplified and saved to a small .npz next to the app, so later starts (and
+    offline machines) only load arrays. Also shared in-process between renderers.
+    No cache files are shipped: run "python FeatureCache.py" once with network
+    access (or the shapefiles in cartopy's data dir) to build them all.
+    """
+    _loaded = {}
+    # one thread reads or writes the files at a time, the others wait for its result
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or get_resource_path("map_cache")
+
+    @staticmethod
+    def tolerance_for(map_width_px):
+        # the TOLERANCES entry nearest (by ratio) to half a pixel of the 360 degree wide map
+        if not map_width_px:
+            return TOLERANCES[0]
+        half_pixel = 180 / map_width_px
+        return min(TOLERANCES, key=lambda tolerance: abs(np.log(tolerance / half_pixel)))
+
+    def cache_file(self, scale, tolerance):
+        return os.path.join(self.cache_dir, f"features_{scale}_{tolerance:g}.npz")
+
+    def get_paths(self, scale="110m", tolerance=TOLERANCES[0]):
+        """Return {feature name: Path}; features that cannot be loaded are empty paths."""
+        key = (scale, tolerance)
+        with FeatureCache._lock:
+            if key not in FeatureCache._loaded:
+                arrays = self._load(scale, tolerance)
+                FeatureCache._loaded[key] = {
+                    name: Path(arrays[f"{name}_vertices"], arrays[f"{name}_codes"])
+                    for name in MAP_FEATURES
+                }
+            return FeatureCache._loaded[key]
+
+    def _load(self, scale, tolerance):
+        cache_file = self.cache_file(scale, tolerance)
+        if os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as data:
+                    return {name: data[name] for name in data.files}
+            except Exception as e:
+                print(f"Error reading map feature cache {cache_file}: {e}")
+
+        arrays = self._parse(scale, tolerance)
+        if arrays is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez_compressed(cache_file, **arrays)
+            except OSError as e:
+                print(f"Error writing map feature cache {cache_file}: {e}")
+            return arrays
+
+        # offline without shapefiles: another tolerance of the same scale (or
+        # another scale) looks almost the same, better than an empty map
+        for other in self._fallback_files(scale, tolerance):
+            try:
+                with np.load(other) as data:
+                    return {name: data[name] for name in data.files}
+            except Exception as e:
+                print(f"Error reading map feature cache {other}: {e}")
+        arrays = {}
+        for name in MAP_FEATURES:
+            arrays[f"{name}_vertices"] = np.empty((0, 2), dtype=np.float32)
+            arrays[f"{name}_codes"] = np.empty(0, dtype=np.uint8)
+        return arrays
+
+    def _fallback_files(self, scale, tolerance):
+        # existing cache files, same scale first, then by closeness of tolerance
+        found = []
+        for other_scale in [scale] + [name for name in ("110m", "50m", "10m") if name != scale]:
+            for other in sorted(TOLERANCES, key=lambda value: abs(np.log(value / tolerance))):
+                path = self.cache_file(other_scale, other)
+                if os.path.exists(path):
+                    found.append(path)
+        return found
+
+    def _parse(self, scale, tolerance):
+        # all layers from the shapefiles, None if any of them cannot be read
+        arrays = {}
+        for name, (category, ne_name, polygons) in MAP_FEATURES.items():
+            try:
+                vertices, codes = _read_feature(scale, category, ne_name, polygons, tolerance)
+            except Exception as e:
+                print(f"Error loading map feature {name} ({scale}): {e}")
+                return None
+            arrays[f"{name}_vertices"] = vertices
+            arrays[f"{name}_codes"] = codes
+        return arrays
+
+
+if __name__ == "__main__":
+    # Pre-build the caches shipped with the app: every scale of the quality
+    # tiers at every tolerance, so no tier, window size or HiDPI screen needs
+    # the shapefiles at run time. Needs network access the first time; copy the
+    # map_cache folder next to the app on offline machines.  python FeatureCache.py
+    from MapRenderer import QUALITY_TIERS
+    cache = FeatureCache()
+    for scale in sorted({tier["coastline_scale"] for tier in QUALITY_TIERS}):
+        for tolerance in TOLERANCES:
+            paths = cache.get_paths(scale, tolerance)
+            sizes = ", ".join(f"{name} {len(path.vertices)}" for name, path in paths.items())
+            print(f"{cache.cache_file(scale, tolerance)}: {sizes} vertices")
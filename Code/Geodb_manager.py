@@ -0,0 +1,183 @@
+import csv
+import math
+import sqlite3
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DB_NAME = "GeoCache.db"
+# size of a cache cell in degrees, about 11 km of latitude; all points in a
+# cell share one city
+CELL_SIZE = 0.1
+
+def get_resource_path(relative_path):
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def cell_of(latitude: float, longitude: float) -> Tuple[int, int]:
+    return math.floor(latitude / CELL_SIZE), math.floor(longitude / CELL_SIZE)
+
+class GeoDBManager:
+    """
+    Reverse-geocode cache: city names keyed by quantized lat/lon cells, with a
+    time to live for entries and least-recently-used eviction above max_rows.
+    Shared between the GUI thread and the location resolver thread.
+
+    Lookups are answered from an in-memory copy of the rows read so far, and
+    the last_used times of hits are written back in batches (at most every
+    flush_interval seconds), so a repeat lookup does not touch the disk.
+    """
+    def __init__(self, db_path=None, ttl_days=30, max_rows=5000, flush_interval=60):
+        db_path = db_path or get_resource_path(DB_NAME)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.ttl = ttl_days * 24 * 3600
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        # cell -> (city, updated) for rows already read, and cell -> last use
+        # time not yet written back
+        self._memo = {}
+        self._touched = {}
+        self.flush_interval = flush_interval
+        self._last_flush = time.time()
+        self._create_table()
+
+    def _create_table(self):
+        """
+        Create the geocode table if it doesn't exist.
+        Columns:
+          - lat_cell, lon_cell: INTEGER (floor of lat/lon divided by CELL_SIZE)
+          - latitude, longitude: REAL (point that was looked up)
+          - city: TEXT
+          - updated: REAL (unix time the city was resolved, for the TTL)
+          - last_used: REAL (unix time of the last read, for LRU eviction)
+        """
+        with self._lock:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                lat_cell INTEGER,
+                lon_cell INTEGER,
+                latitude REAL,
+                longitude REAL,
+                city TEXT,
+                updated REAL,
+                last_used REAL,
+                PRIMARY KEY (lat_cell, lon_cell)
+            )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_geocode_last_used ON geocode (last_used)")
+            self.conn.commit()
+
+    def get_city(self, latitude: float, longitude: float, allow_expired: bool = False) -> Optional[str]:
+        """
+        Return the cached city of the cell containing (latitude, longitude), or None.
+        Expired entries are only returned with allow_expired, e.g. when offline.
+        """
+        cell = cell_of(latitude, longitude)
+        now = time.time()
+        with self._lock:
+            if cell in self._memo:
+                entry = self._memo[cell]
+            else:
+                row = self.conn.execute(
+                    "SELECT city, updated FROM geocode WHERE lat_cell = ? AND lon_cell = ?",
+                    cell
+                ).fetchone()
+                entry = (row["city"], row["updated"]) if row else None
+                self._memo[cell] = entry
+            if entry is None or (not allow_expired and now - entry[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[cell] = now
+            if now - self._last_flush > self.flush_interval:
+                self._flush()
+            return entry[0]
+
+    def _flush(self):
+        # write back the last_used times of cache hits
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE geocode SET last_used = ? WHERE lat_cell = ? AND lon_cell = ?",
+                [(used, lat_cell, lon_cell) for (lat_cell, lon_cell), used in self._touched.items()]
+            )
+            self.conn.commit()
+            self._touched = {}
+        self._last_flush = time.time()
+
+    def put_city(self, latitude: float, longitude: float, city: str):
+        lat_cell, lon_cell = cell_of(latitude, longitude)
+        now = time.time()
+        with self._lock:
+            self.conn.execute("""
+            INSERT OR REPLACE INTO geocode (lat_cell, lon_cell, latitude, longitude, city, updated, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (lat_cell, lon_cell, latitude, longitude, city, now, now))
+            self._memo[(lat_cell, lon_cell)] = (city, now)
+            self._flush()
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # drop the least recently used rows above max_rows
+        cursor = self.conn.execute("""
+        DELETE FROM geocode WHERE rowid IN (
+            SELECT rowid FROM geocode ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+        """, (self.max_rows,))
+        if cursor.rowcount:
+            self._memo = {}
+
+    def last_known(self) -> Optional[Tuple[float, float, str]]:
+        """The most recently used (latitude, longitude, city), for offline starts; prewarmed rows never count."""
+        with self._lock:
+            self._flush()
+            row = self.conn.execute(
+                "SELECT latitude, longitude, city FROM geocode WHERE last_used > 0 ORDER BY last_used DESC LIMIT 1"
+            ).fetchone()
+        if row is None:
+            return None
+        return row["latitude"], row["longitude"], row["city"]
+
+    def prewarm(self, csv_path: str) -> int:
+        """
+        Bulk load a CSV with latitude, longitude and city columns (header row
+        required) in one transaction; returns the number of rows loaded.
+        """
+        now = time.time()
+        rows = []
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                latitude = float(record["latitude"])
+                longitude = float(record["longitude"])
+                lat_cell, lon_cell = cell_of(latitude, longitude)
+                # prewarmed rows are least recent, real lookups evict them first
+                rows.append((lat_cell, lon_cell, latitude, longitude, record["city"], now, 0))
+        with self._lock:
+            self.conn.executemany("""
+            INSERT OR REPLACE INTO geocode (lat_cell, lon_cell, latitude, longitude, city, updated, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._memo = {}
+            self._flush()
+            self._evict()
+            self.conn.commit()
+        return len(rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._flush()
+            count = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "rows": count}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+        self.conn.close()
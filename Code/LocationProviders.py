@@ -0,0 +1,283 @@
+import json
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional, Tuple
+
+import geocoder
+from geopy.geocoders import Nominatim
+
+from OfflineGeocoder import GazetteerGeocoder
+
+
+class ProviderUnavailable(Exception):
+    """A provider could not answer, e.g. no location in the service response."""
+
+
+class CircuitBreaker:
+    """
+    Per-provider failure handling. After a failure the provider is skipped for
+    base_delay, doubling with every further failure in a row (exponential
+    backoff). After failure_threshold failures in a row the circuit opens and
+    the provider is left alone for cool_off seconds; the first call after that
+    is a trial, success closes the circuit again.
+    """
+    def __init__(self, failure_threshold=3, base_delay=5.0, cool_off=600.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.cool_off = cool_off
+        self.clock = clock
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold and self.clock() < self.retry_at
+
+    def allow(self) -> bool:
+        return self.clock() >= self.retry_at
+
+    def record_success(self):
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+    def record_failure(self, error):
+        self.failures += 1
+        self.last_error = error
+        if self.failures >= self.failure_threshold:
+            delay = self.cool_off
+        else:
+            delay = min(self.base_delay * 2 ** (self.failures - 1), self.cool_off)
+        self.retry_at = self.clock() + delay
+
+
+class LocationProvider:
+    """
+    Base class. A provider can locate this machine, reverse geocode a
+    coordinate to a city, or both; unsupported calls return None.
+    timeout is the deadline the chain gives every call of this provider.
+    """
+    name = "provider"
+    timeout = 5.0
+
+    def locate(self) -> Optional[Tuple[float, float]]:
+        return None
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        return None
+
+
+class IPLocationProvider(LocationProvider):
+    """Coordinates of our public IP via geocoder.ip."""
+    name = "ip"
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+
+    def locate(self):
+        g = geocoder.ip('me', timeout=self.timeout)
+        if not g or not g.latlng:
+            raise ProviderUnavailable(f"no IP location ({g.status if g else 'no response'})")
+        latitude, longitude = g.latlng
+        return float(latitude), float(longitude)
+
+
+class NominatimProvider(LocationProvider):
+    """City name from OpenStreetMap's Nominatim."""
+    name = "nominatim"
+    # address fields searched in order of priority
+    city_keys = ['city', 'town', 'village', 'municipality', 'county', 'state', 'region']
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.geolocator = Nominatim(user_agent="geo_locator_app", timeout=timeout)
+
+    def reverse(self, latitude, longitude):
+        location = self.geolocator.reverse((latitude, longitude), exactly_one=True, language='en')
+        if not location:
+            return None
+        address = location.raw.get('address', {})
+        for key in self.city_keys:
+            if key in address:
+                return address[key]
+        return None
+
+
+class FixedLocationProvider(LocationProvider):
+    """A configured location (and optionally city), e.g. for kiosks without network."""
+    name = "fixed"
+
+    def __init__(self, latitude, longitude, city=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.city = city
+
+    def locate(self):
+        return self.latitude, self.longitude
+
+    def reverse(self, latitude, longitude):
+        return self.city
+
+
+class GazetteerProvider(LocationProvider):
+    """Nearest city from the local gazetteer, loaded on first use."""
+    name = "gazetteer"
+
+    def __init__(self, path=None, max_distance_km=100.0):
+        self.path = path
+        self.max_distance_km = max_distance_km
+        self._geocoder = None
+
+    def reverse(self, latitude, longitude):
+        if self._geocoder is None:
+            self._geocoder = GazetteerGeocoder(self.path)
+        return self._geocoder.city(latitude, longitude, self.max_distance_km)
+
+
+class HTTPJSONProvider(LocationProvider):
+    """
+    Small JSON-over-HTTP service: GET <base_url>/locate -> {"lat", "lon"} and
+    GET <base_url>/reverse?lat=..&lon=.. -> {"city"}. Used with the stub server
+    below for testing, or with a location service on the local network.
+    """
+    name = "http"
+
+    def __init__(self, base_url, timeout=2.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def locate(self):
+        data = self._get("/locate")
+        return float(data["lat"]), float(data["lon"])
+
+    def reverse(self, latitude, longitude):
+        query = urllib.parse.urlencode({"lat": latitude, "lon": longitude})
+        return self._get(f"/reverse?{query}").get("city")
+
+
+class ProviderChain:
+    """
+    Asks providers in order until one answers. Every call runs with the
+    provider's deadline; failures and timeouts go to the provider's circuit
+    breaker, and providers in backoff or with an open circuit are skipped
+    without being called.
+
+    Each provider has its own worker thread: a call that misses its deadline
+    keeps running there, and the provider is skipped until it returns, so a
+    hung service cannot starve the others.
+    """
+    def __init__(self, providers, breaker_factory=CircuitBreaker):
+        self.providers = list(providers)
+        self.breakers = {provider.name: breaker_factory() for provider in self.providers}
+        self._executors = {
+            provider.name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"location-{provider.name}")
+            for provider in self.providers
+        }
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _call(self, provider, method, *args):
+        breaker = self.breakers[provider.name]
+        with self._lock:
+            running = self._running.get(provider.name)
+            if not breaker.allow() or (running is not None and not running.done()):
+                return None
+            future = self._executors[provider.name].submit(getattr(provider, method), *args)
+            self._running[provider.name] = future
+        try:
+            result = future.result(timeout=provider.timeout)
+        except FutureTimeout:
+            error = ProviderUnavailable(f"no answer within {provider.timeout:g} s")
+        except Exception as e:
+            error = e
+        else:
+            with self._lock:
+                breaker.record_success()
+            return result
+        with self._lock:
+            was_open = breaker.is_open
+            breaker.record_failure(error)
+            if breaker.is_open and not was_open:
+                print(f"Location provider {provider.name} disabled for {breaker.cool_off:g} s: {error}")
+        return None
+
+    def locate(self) -> Optional[Tuple[float, float]]:
+        for provider in self.providers:
+            result = self._call(provider, "locate")
+            if result is not None:
+                return result
+        return None
+
+    def reverse(self, latitude, longitude) -> Optional[str]:
+        for provider in self.providers:
+            result = self._call(provider, "reverse", latitude, longitude)
+            if result:
+                return result
+        return None
+
+    def status(self) -> dict:
+        """provider name -> (consecutive failures, circuit open, last error)"""
+        with self._lock:
+            return {
+                name: (breaker.failures, breaker.is_open, breaker.last_error)
+                for name, breaker in self.breakers.items()
+            }
+
+
+def default_provider_chain(gazetteer_mode="fallback", fixed_location=None):
+    """
+    IP lookup and Nominatim, with the local gazetteer behind Nominatim
+    ("fallback") or in front of it ("primary"). A fixed (lat, lon[, city])
+    replaces the IP lookup.
+    """
+    providers = []
+    if fixed_location:
+        providers.append(FixedLocationProvider(*fixed_location))
+    else:
+        providers.append(IPLocationProvider())
+    if gazetteer_mode == "primary":
+        providers += [GazetteerProvider(), NominatimProvider()]
+    else:
+        providers += [NominatimProvider(), GazetteerProvider()]
+    return ProviderChain(providers)
+
+
+def run_stub_server(port=8765, latitude=53.4084, longitude=-2.9916, city="Liverpool"):
+    """Serve fixed answers for HTTPJSONProvider on localhost (blocks)."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urllib.parse.urlparse(self.path).path
+            if path == "/locate":
+                body = {"lat": latitude, "lon": longitude}
+            elif path == "/reverse":
+                body = {"city": city}
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    # python LocationProviders.py [port]  -> stub location server for testing
+    run_stub_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
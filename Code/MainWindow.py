@@ -1,13 +1,14 @@
 from PyQt6.QtWidgets import QMainWindow, QWidget, QStackedWidget, QPushButton, QLabel
-from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtGui import QFont
 from UIDesign import UIDesign
 from MainPage import MainPage
 from CalendarPage import CalendarPage
 from ToDoPage import Todo_MainWindow
 from ExpenditurePage import ExpenditurePage
-from TimeLocationUtils import get_current_time, get_city
+from TimeLocationUtils import get_current_time, get_city, get_clock, get_location_notifier
 from TimeWindow import TimeWindow
+from MapWidget import MapRefreshScheduler
 
 # Make our label can be clicked
 class ClickableLabel(QLabel):
@@ -103,12 +104,19 @@ class MainWindow(QMainWindow):
         self.location_label.setStyleSheet(UIDesign.LABEL_STYLE)
         self.location_label.setVisible(False)
 
-        # show the time
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_time)
-        self.timer.start(1000)
+        # show the time; the label only shows minutes, so it follows the shared
+        # clock's minute changes instead of redrawing every second
+        self.clock = get_clock()
+        self.clock.minute_changed.connect(self.update_time)
+        self.clock.start()
         self.update_time()
 
+        # the map has its own cadence, it only redraws when the terminator moved
+        self.map_scheduler = MapRefreshScheduler(self.main_page.map_widget, parent=self)
+
+        # the city is resolved in the background, update the label when it arrives
+        get_location_notifier().city_changed.connect(self.update_city)
+
         # time functin window
         self.time_window = TimeWindow(self)
         self.time_window.setGeometry(100, 50, 800, 500)
@@ -128,6 +136,8 @@ class MainWindow(QMainWindow):
             self.location_label.setVisible(True)
         self.time_label.setGeometry(36, 440, 203, 130)  # lower left
         self.update_time()
+        # catch up on terminator movement missed while the map was hidden
+        self.map_scheduler.poll()
 
     def show_function_page(self, index):
         self.pages_widget.setCurrentIndex(index)
@@ -137,7 +147,7 @@ class MainWindow(QMainWindow):
         self.time_label.setGeometry(895, 12, 100, 40)  # move to top right corner
         self.update_time()
 
-    def update_time(self):
+    def update_time(self, snapshot=None):
         current_time, current_date = get_current_time()
         if self.pages_widget.currentIndex() == 0:
             # style in main page
@@ -155,9 +165,7 @@ class MainWindow(QMainWindow):
                 f"<span style='font-size:15px;'>{current_date}</span>"
                 "</div></html>"
             )
-        # update our map after update time
         self.time_label.setText(text_html)
-        self.main_page.map_widget.update_map()
 
     def unlock_application(self):
         self.is_locked = False
@@ -173,11 +181,13 @@ class MainWindow(QMainWindow):
 
         self.lock_button.setVisible(False)
 
-        # function in TimeLocationUtils
-        city = get_city()
-        self.location_label.setText(f"Location: {city}")
+        # function in TimeLocationUtils, returns the last known city at once
+        self.update_city(get_city())
         self.main_page.map_widget.show_location = True
-        self.main_page.map_widget.update_map()
+        self.map_scheduler.request_refresh()
+
+    def update_city(self, city):
+        self.location_label.setText(f"Location: {city}")
 
     def open_time_window(self):
         self.time_window.show()
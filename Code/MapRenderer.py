@@ -0,0 +1,456 @@
+import math
+import tempfile
+import threading
+import time
+import numpy as np
+import cartopy.crs as ccrs
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.colors import hex2color
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+from FeatureCache import FeatureCache
+from SolarGeometry import SolarGrid, TWILIGHT_THRESHOLDS, subsolar_point, terminator_curve
+
+# lon/lat window shown by the map
+MAP_EXTENT = (-180, 180, -60, 90)
+
+# cartopy shares cached pyproj transformers between axes and Agg keeps font
+# state in module globals, neither is thread safe: renderers in different
+# threads (live worker, atlas builder) take turns
+_RENDER_LOCK = threading.Lock()
+
+# Render quality tiers from best to cheapest: zenith grid step in degrees,
+# Natural Earth scale, fraction of the widget resolution that is rendered (the
+# pixmap is scaled up) and number of terminator gradient segments
+QUALITY_TIERS = [
+    {"name": "high", "grid_step": 0.5, "coastline_scale": "50m", "resolution": 1.0, "segments": 720},
+    {"name": "normal", "grid_step": 1.0, "coastline_scale": "110m", "resolution": 1.0, "segments": 360},
+    {"name": "low", "grid_step": 2.0, "coastline_scale": "110m", "resolution": 0.75, "segments": 180},
+    {"name": "minimal", "grid_step": 3.0, "coastline_scale": "110m", "resolution": 0.5, "segments": 90},
+]
+# index of the tier used by default, same output as before tiers existed
+DEFAULT_TIER = 1
+
+
+class MapRenderer:
+    """
+    Offscreen Agg renderer for the world map. It does not touch any Qt widget,
+    so it can run in a worker thread; render() returns the map area as pixels.
+    """
+    def __init__(self, width=1000, height=600, dpi=100, tier=DEFAULT_TIER):
+        # requested size in pixels at full resolution, tiers may render smaller
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        # set from QUALITY_TIERS by set_tier(): samples along the terminator,
+        # cached lat/lon trig tables for the shade and Natural Earth scale
+        self.tier = None
+        self.terminator_points = None
+        self.solar_grid = None
+        self.coastline_scale = None
+        # cos(zenith) levels bounding night and the astronomical, nautical and
+        # civil twilight bands (-1.01 is just below the minimum of a cosine),
+        # and the shade alpha of each band; full night keeps the old 0.7
+        self.shade_levels = [
+            -1.01,
+            TWILIGHT_THRESHOLDS["astronomical"],
+            TWILIGHT_THRESHOLDS["nautical"],
+            TWILIGHT_THRESHOLDS["civil"],
+            0.0,
+        ]
+        self.shade_alphas = [0.7, 0.55, 0.4, 0.25]
+        self.feature_cache = FeatureCache()
+
+        self.fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111, projection=ccrs.PlateCarree())
+        self.fig.patch.set_facecolor('black')
+        self.ax.set_facecolor('black')
+
+        # Coastline/land/ocean never change, so they are rendered once into a
+        # cached background; every frame only the overlay artists are drawn on top
+        self._background = None
+        # overlay artists, all persistent and updated in place every frame
+        self._overlay_artists = []
+        # (x, y, width, height) of the map inside the canvas, top-left origin
+        self.map_rect = (0, 0, width, height)
+
+        self.set_tier(tier)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @property
+    def canvas_size(self):
+        # pixels actually rendered at the current tier
+        return (int(round(self.fig.bbox.width)), int(round(self.fig.bbox.height)))
+
+    def _apply_size(self):
+        # lower tiers render with fewer pixels per inch, the figure keeps its
+        # size in inches so line widths and markers stay proportional
+        self.fig.set_dpi(self.dpi * QUALITY_TIERS[self.tier]["resolution"])
+        self.fig.set_size_inches(self.width / self.dpi, self.height / self.dpi)
+
+    def resize(self, width, height):
+        if (width, height) == self.size:
+            return
+        self.width = width
+        self.height = height
+        self._apply_size()
+        self.draw_basemap()
+
+    def set_tier(self, tier):
+        """Switch to QUALITY_TIERS[tier], rebuilding the basemap if it changed."""
+        if tier == self.tier:
+            return
+        settings = QUALITY_TIERS[tier]
+        self.tier = tier
+        if self.solar_grid is None or self.solar_grid.step != settings["grid_step"]:
+            self.solar_grid = SolarGrid(step=settings["grid_step"])
+        self.terminator_points = settings["segments"] + 1
+        self.coastline_scale = settings["coastline_scale"]
+        self._apply_size()
+        self.draw_basemap()
+
+    def _add_overlay(self, artist):
+        # animated artists are skipped by a full draw and only drawn per frame;
+        # draw_artist ignores zorder, so keep the order a full draw would use
+        artist.set_animated(True)
+        self._overlay_artists.append(artist)
+        self._overlay_artists.sort(key=lambda overlay: overlay.get_zorder())
+        return artist
+
+    def draw_basemap(self):
+        with _RENDER_LOCK:
+            tolerance = self._layout_map()
+        # loading (or downloading) the features does not hold up other renderers
+        features = self.feature_cache.get_paths(self.coastline_scale, tolerance)
+        with _RENDER_LOCK:
+            self._draw_basemap(features)
+
+    def _layout_map(self):
+        # map window of the axes; returns the feature tolerance for its width
+        self.ax.clear()
+        self._overlay_artists = []
+        # Optionally adjust Axes position in Figure
+        self.ax.set_position([0.1, 0.3, 0.8, 0.6])
+
+        self.ax.set_extent(MAP_EXTENT, crs=ccrs.PlateCarree())
+        self.ax.apply_aspect()
+        return FeatureCache.tolerance_for(self.ax.get_window_extent().width)
+
+    def _draw_basemap(self, features):
+        # Static layer, only rebuilt here and never on the per-frame path.
+        # features: coastline/land/ocean as plain lon/lat paths simplified to
+        # about half a pixel; land and ocean below the coastline, as cartopy's
+        # features were drawn
+        self.ax.add_patch(PathPatch(
+            features["land"], facecolor='#C0C0C0', edgecolor='#C0C0C0', zorder=-1,
+            transform=self.ax.transData
+        ))
+        self.ax.add_patch(PathPatch(
+            features["ocean"], facecolor='#000000', edgecolor='#000000', zorder=-1,
+            transform=self.ax.transData
+        ))
+        self.ax.add_patch(PathPatch(
+            features["coastline"], facecolor='none', edgecolor='black', linewidth=1,
+            transform=self.ax.transData
+        ))
+        # adding patches must not move the map window
+        self.ax.set_extent(MAP_EXTENT, crs=ccrs.PlateCarree())
+
+        # Night and twilight shade: one persistent collection holding a path per
+        # band, refilled every frame. The axes are PlateCarree, so lon/lat already
+        # are data coordinates and transData skips cartopy's per-path projection
+        self._shade = self.ax.add_collection(PathCollection(
+            [],
+            facecolors=[(0, 0, 0, alpha) for alpha in self.shade_alphas],
+            edgecolors='none',
+            linewidths=0,
+            zorder=1,
+            transform=self.ax.transData
+        ), autolim=False)
+        self._add_overlay(self._shade)
+
+        # Subsolar point, moved with set_data every frame
+        self._subsolar_marker, = self.ax.plot(
+            [0], [0],
+            marker='o',
+            color='#FFD54F',
+            markersize=8,
+            markeredgecolor='#FFFFFF',
+            markeredgewidth=1,
+            transform=ccrs.PlateCarree()
+        )
+        self._add_overlay(self._subsolar_marker)
+
+        # Terminator: one LineCollection for all gradient segments, refilled in
+        # place from preallocated (segments, 2, 2) vertex and (segments, 4) colour
+        # buffers; the gradient fades out towards the south
+        count = self.terminator_points - 1
+        self._terminator_segments = np.empty((count, 2, 2))
+        self._terminator_colors = np.empty((count, 4))
+        self._terminator_colors[:, :3] = hex2color('#808080')
+        self._terminator_lat = np.empty(count)
+        self._terminator = self.ax.add_collection(LineCollection(
+            [],
+            linewidths=2,
+            transform=self.ax.transData
+        ), autolim=False)
+        self._add_overlay(self._terminator)
+
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+        # Only the axes area changes between frames, the rest of the figure is
+        # plain black, so frames are cropped to it (rounded outwards)
+        bbox = self.ax.get_window_extent()
+        width, height = self.canvas_size
+        x0 = max(int(math.floor(bbox.x0)), 0)
+        x1 = min(int(math.ceil(bbox.x1)), width)
+        top = max(int(math.floor(height - bbox.y1)), 0)
+        bottom = min(int(math.ceil(height - bbox.y0)), height)
+        self.map_rect = (x0, top, x1 - x0, bottom - top)
+
+    def render(self, decimal_utc, year_day):
+        """
+        Draw the overlay for the given UTC time onto the cached basemap and return
+        the map area as an (h, w, 4) RGBA view of the canvas buffer. The view is
+        overwritten by the next render, copy it if it has to be kept.
+        """
+        with _RENDER_LOCK:
+            return self._render(decimal_utc, year_day)
+
+    def _render(self, decimal_utc, year_day):
+        # Terminator straight from its closed form, lat as a function of lon
+        curve = terminator_curve(decimal_utc, year_day, self.terminator_points)
+        segments = self._terminator_segments
+        segments[:, 0] = curve[:-1]
+        segments[:, 1] = curve[1:]
+        # alpha from the segment's mean latitude, clip((lat + 60) / 90, 0.1, 1)
+        lat = self._terminator_lat
+        np.add(segments[:, 0, 1], segments[:, 1, 1], out=lat)
+        np.multiply(lat, 0.5, out=lat)
+        np.add(lat, 60, out=lat)
+        np.divide(lat, 90, out=lat)
+        np.clip(lat, 0.1, 1, out=self._terminator_colors[:, 3])
+        self._terminator.set_segments(segments)
+        self._terminator.set_colors(self._terminator_colors)
+
+        # Night and all twilight bands come from this single zenith evaluation
+        self.solar_grid.evaluate(decimal_utc, year_day)
+        self._shade.set_paths([
+            Path(vertices, codes)
+            for vertices, codes in self.solar_grid.band_polygons(self.shade_levels)
+        ])
+
+        sun_lon, sun_lat = subsolar_point(decimal_utc, year_day)
+        self._subsolar_marker.set_data([sun_lon], [sun_lat])
+
+        # Restore the cached basemap and composite only the overlay
+        self.canvas.restore_region(self._background)
+        for artist in self._overlay_artists:
+            self.ax.draw_artist(artist)
+
+        x, y, w, h = self.map_rect
+        return np.asarray(self.canvas.buffer_rgba())[y:y + h, x:x + w]
+
+
+def frame_to_qimage(frame):
+    """Copy an (h, w, 3) RGB or (h, w, 4) RGBA uint8 array into a QImage."""
+    frame = np.ascontiguousarray(frame)
+    height, width, channels = frame.shape
+    image_format = QImage.Format.Format_RGB888 if channels == 3 else QImage.Format.Format_RGBA8888
+    # QImage only wraps the buffer, copy() detaches it from the numpy array
+    return QImage(frame.data, width, height, frame.strides[0], image_format).copy()
+
+
+class MapRenderWorker(QThread):
+    """
+    Renders live frames with its own MapRenderer in a worker thread and hands
+    each finished frame to the GUI thread as a QImage, together with the canvas
+    size, map rect, request key and render time in ms. Requests are coalesced:
+    only the newest one waiting is rendered next.
+
+    This is a run() loop rather than a QObject moved to a thread on purpose:
+    queued slots would each get a fresh Python thread state, which drops the
+    thread-local PROJ context behind cartopy's cached transformers.
+    """
+    frame_ready = pyqtSignal(QImage, object, object, object, float)
+    render_failed = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._condition = threading.Condition()
+        self._request = None
+
+    def request(self, decimal_utc, year_day, size, key, tier=DEFAULT_TIER):
+        with self._condition:
+            self._request = (decimal_utc, year_day, size, key, tier)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self.requestInterruption()
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        # created here, so cartopy loads the features in the worker
+        renderer = None
+        while True:
+            with self._condition:
+                while self._request is None and not self.isInterruptionRequested():
+                    self._condition.wait()
+                if self.isInterruptionRequested():
+                    return
+                decimal_utc, year_day, size, key, tier = self._request
+                self._request = None
+            try:
+                if renderer is None:
+                    renderer = MapRenderer(*size, tier=tier)
+                else:
+                    renderer.resize(*size)
+                    renderer.set_tier(tier)
+                # only the per-frame cost is timed, not a basemap rebuild
+                start = time.perf_counter()
+                image = frame_to_qimage(renderer.render(decimal_utc, year_day))
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                print(f"Error rendering map: {e}")
+                self.render_failed.emit(key)
+                continue
+            self.frame_ready.emit(image, renderer.canvas_size, renderer.map_rect, key, elapsed_ms)
+
+
+class QualityController:
+    """
+    Picks the render tier from measured frame times. A frame over budget_ms
+    drops one tier straight away; upgrade_after frames in a row under
+    headroom * budget_ms step back up one tier, never above best_tier.
+    """
+    def __init__(self, budget_ms=50.0, headroom=0.5, upgrade_after=20, best_tier=DEFAULT_TIER):
+        self.budget_ms = budget_ms
+        self.headroom = headroom
+        self.upgrade_after = upgrade_after
+        self.best_tier = best_tier
+        self.tier = best_tier
+        self._fast_frames = 0
+
+    @property
+    def tier_name(self):
+        return QUALITY_TIERS[self.tier]["name"]
+
+    def record(self, elapsed_ms):
+        """Feed one measured frame time, returns True when the tier changed."""
+        if elapsed_ms > self.budget_ms:
+            self._fast_frames = 0
+            if self.tier < len(QUALITY_TIERS) - 1:
+                self.tier += 1
+                return True
+            return False
+        if elapsed_ms < self.budget_ms * self.headroom:
+            self._fast_frames += 1
+            if self._fast_frames >= self.upgrade_after and self.tier > self.best_tier:
+                self.tier -= 1
+                self._fast_frames = 0
+                return True
+        else:
+            self._fast_frames = 0
+        return False
+
+
+class FrameAtlas:
+    """
+    Pre-rendered map frames for one UTC day, one every step_minutes.
+    Frames are the cropped map area as RGB (the basemap is opaque, alpha is
+    always 255), memory-mapped from an anonymous temporary file in directory
+    (default: the system temp dir): a day at 15 minutes is ~77 MB for an
+    800x334 map and four times that on a 2x display, so the OS pages frames in
+    and out instead of the process holding them all. Every atlas has a file of
+    its own, so building the next one never truncates frames still shown.
+    """
+    def __init__(self, utc_date, step_minutes, size, canvas_size, map_rect, directory=None):
+        self.utc_date = utc_date
+        self.step_minutes = step_minutes
+        # widget size the frames were rendered for, a resize needs a new atlas,
+        # and the pixels actually rendered at the builder's tier
+        self.size = size
+        self.canvas_size = canvas_size
+        self.map_rect = map_rect
+        count = int(math.ceil(24 * 60 / step_minutes))
+        shape = (count, map_rect[3], map_rect[2], 3)
+        # the temporary file is deleted on close, the mapping keeps it alive
+        self.frames = np.memmap(tempfile.TemporaryFile(prefix="map_atlas_", dir=directory),
+                                dtype=np.uint8, mode='w+', shape=shape)
+        self.rendered = 0
+
+    @property
+    def frame_count(self):
+        return len(self.frames)
+
+    @property
+    def year_day(self):
+        return self.utc_date.timetuple().tm_yday
+
+    @property
+    def is_complete(self):
+        return self.rendered == self.frame_count
+
+    def matches(self, utc_date, size):
+        return self.utc_date == utc_date and self.size == size
+
+    def frame_time(self, index):
+        # decimal UTC hour the frame was rendered at
+        return index * self.step_minutes / 60
+
+    def frame_index(self, decimal_utc):
+        # nearest frame, the last one also covers the minutes before midnight
+        index = int(round(decimal_utc * 60 / self.step_minutes))
+        return min(max(index, 0), self.frame_count - 1)
+
+    def store(self, index, rgba):
+        self.frames[index] = rgba[:, :, :3]
+        self.rendered = max(self.rendered, index + 1)
+
+    def frame(self, index):
+        return self.frames[index]
+
+
+class AtlasBuilder(QThread):
+    """
+    Renders a whole FrameAtlas in a worker thread with its own MapRenderer,
+    then hands it over through atlas_ready. Interruptible between frames.
+    """
+    atlas_ready = pyqtSignal(object)
+
+    def __init__(self, utc_date, size, step_minutes=15, directory=None, tier=DEFAULT_TIER, parent=None):
+        super().__init__(parent)
+        self.utc_date = utc_date
+        self.size = size
+        self.step_minutes = step_minutes
+        self.directory = directory
+        self.tier = tier
+
+    def run(self):
+        try:
+            renderer = MapRenderer(*self.size, tier=self.tier)
+            atlas = FrameAtlas(
+                self.utc_date, self.step_minutes, self.size,
+                renderer.canvas_size, renderer.map_rect, self.directory
+            )
+            for index in range(atlas.frame_count):
+                if self.isInterruptionRequested():
+                    return
+                atlas.store(index, renderer.render(atlas.frame_time(index), atlas.year_day))
+        except Exception as e:
+            print(f"Error building map atlas: {e}")
+            return
+        # written pages become clean, the OS can drop them without swapping
+        atlas.frames.flush()
+        self.atlas_ready.emit(atlas)
@@ -1,148 +1,271 @@
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import numpy as np
-from datetime import datetime, timezone, timedelta
-from TimeLocationUtils import get_location, get_utc_time
-from matplotlib.colors import hex2color
-from matplotlib.collections import LineCollection
-
-class MapWidget(FigureCanvas):
-    def __init__(self, parent=None):
+import time
+from TimeLocationUtils import get_clock, get_location, get_location_notifier, get_utc_time
+from MapRenderer import MAP_EXTENT, AtlasBuilder, MapRenderer, MapRenderWorker, QualityController, frame_to_qimage
+from PyQt6.QtCore import QObject, QPointF, QRectF, QThread, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen, QPixmap
+from PyQt6.QtWidgets import QApplication, QWidget
+from SolarGeometry import subsolar_longitude
+
+class MapWidget(QWidget):
+    """
+    Shows the world map as a ready pixmap. Frames come from a FrameAtlas that an
+    AtlasBuilder pre-renders for the whole UTC day in a worker thread; until the
+    atlas is ready (startup, resize, midnight UTC) frames are rendered live, by
+    default in a MapRenderWorker thread so the GUI thread only paints pixmaps.
+    Live render times feed a QualityController that picks the render tier.
+    """
+    def __init__(self, parent=None, atlas_step_minutes=15, atlas_dir=None, render_in_thread=True):
+        super().__init__(parent)
         # Initialize location attributes (provided by TimeLocationUtils)
         self.current_lat = None
         self.current_lon = None
         # Control whether to show location marker, default is False: locked
         self.show_location = False
+        # Atlas resolution in minutes (None renders every frame live) and an
+        # optional directory for the temporary files the frames are memory-mapped
+        # from (default: the system temp dir)
+        self.atlas_step_minutes = atlas_step_minutes
+        self.atlas_dir = atlas_dir
+        # measured frame times pick the quality tier for live frames and new atlases
+        self.quality = QualityController()
+
+        # live rendering: a worker thread, or a renderer on the GUI thread when
+        # render_in_thread is False
+        self._renderer = None
+        self._render_worker = None
+        # a live frame has been requested and not delivered yet
+        self._render_pending = False
+        self._atlas = None
+        self._atlas_builders = []
+        self._pixmap = None
+        # canvas size and map rect (render pixels) the pixmap belongs to
+        self._frame_size = None
+        self._frame_rect = None
+        self._frame_key = None
 
-        # Create Figure and add an Axes with PlateCarree projection
-        self.fig = Figure(figsize=(10, 5), dpi=100)
-        self.ax = self.fig.add_subplot(111, projection=ccrs.PlateCarree())
-        super().__init__(self.fig)
-        self.setParent(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        if render_in_thread:
+            self._render_worker = MapRenderWorker(parent=self)
+            self._render_worker.frame_ready.connect(self._on_frame_ready)
+            self._render_worker.render_failed.connect(self._on_render_failed)
+            self._render_worker.start()
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.stop_render_threads)
+        # the marker is painted by the widget, new coordinates only need a repaint
+        get_location_notifier().location_changed.connect(self._on_location_changed)
 
-        # Set black background
-        self.fig.patch.set_facecolor('black')
-        self.ax.set_facecolor('black')
+    def _render_size(self):
+        ratio = self.devicePixelRatioF()
+        return (max(int(round(self.width() * ratio)), 1), max(int(round(self.height() * ratio)), 1))
 
-        # Initial map setup
-        self.ax.set_extent([-180, 180, -60, 90], crs=ccrs.PlateCarree())
-        self.ax.coastlines(linewidth=1)
-        self.ax.add_feature(cfeature.LAND, facecolor='#FFFFFF')
-        self.ax.add_feature(cfeature.OCEAN, facecolor='#000000')
+    def _ensure_atlas(self, utc_date, size):
+        # A new UTC day or a new widget size needs a new atlas; start building it
+        # once and keep showing live frames until it arrives
+        if self.atlas_step_minutes is None:
+            return
+        if self._atlas is not None and self._atlas.matches(utc_date, size):
+            return
+        for builder in self._atlas_builders:
+            if builder.utc_date == utc_date and builder.size == size and not builder.isInterruptionRequested():
+                return
+            builder.requestInterruption()
+        builder = AtlasBuilder(
+            utc_date, size, self.atlas_step_minutes, self.atlas_dir,
+            tier=self.quality.tier, parent=self
+        )
+        builder.atlas_ready.connect(self._on_atlas_ready)
+        builder.finished.connect(lambda builder=builder: self._on_builder_finished(builder))
+        self._atlas_builders.append(builder)
+        builder.start(QThread.Priority.LowPriority)
 
+    def _on_atlas_ready(self, atlas):
+        time_data = get_utc_time()
+        if not atlas.matches(time_data["utc_time"].date(), self._render_size()):
+            return
+        self._atlas = atlas
+        # the live renderer is only needed again after the next rollover
+        self._renderer = None
         self.draw_map()
 
-    def draw_map(self):
-        # Clear previous drawings
-        self.ax.clear()
-        # Optionally adjust Axes position in Figure
-        self.ax.set_position([0.1, 0.3, 0.8, 0.6])
+    def _on_location_changed(self, lat, lon):
+        self.current_lat, self.current_lon = lat, lon
+        self.update()
 
-        self.ax.set_extent([-180, 180, -60, 90], crs=ccrs.PlateCarree())
-        self.ax.coastlines(linewidth=1)
-        self.ax.add_feature(cfeature.LAND, facecolor='#C0C0C0')
-        self.ax.add_feature(cfeature.OCEAN, facecolor='#000000')
+    def _on_builder_finished(self, builder):
+        if builder in self._atlas_builders:
+            self._atlas_builders.remove(builder)
+        builder.deleteLater()
 
-        # Get current UTC time information using TimeLocationUtils
-        time_data = get_utc_time()
-        decimal_utc = time_data["decimal_utc"]
-        n = time_data["year_day"]
+    def stop_render_threads(self):
+        for builder in self._atlas_builders:
+            builder.requestInterruption()
+        for builder in self._atlas_builders:
+            builder.wait()
+        if self._render_worker is not None:
+            self._render_worker.stop()
 
-        # Calculate solar declination (radians)
-        decl = np.deg2rad(-23.44 * np.cos(2 * np.pi * (n + 10) / 365))
+    def _request_live_frame(self, decimal_utc, year_day, size, key):
+        if self._render_worker is None:
+            if self._renderer is None:
+                self._renderer = MapRenderer(*size, tier=self.quality.tier)
+            self._renderer.resize(*size)
+            self._renderer.set_tier(self.quality.tier)
+            start = time.perf_counter()
+            frame = self._renderer.render(decimal_utc, year_day)
+            self.quality.record((time.perf_counter() - start) * 1000)
+            self._set_frame(frame_to_qimage(frame), self._renderer.canvas_size, self._renderer.map_rect, key)
+            return
+        # the worker replaces a request it has not started yet with this one
+        self._render_pending = True
+        self._render_worker.request(decimal_utc, year_day, size, key, self.quality.tier)
 
-        # Construct longitude-latitude grid
-        lon = np.linspace(-180, 180, 361)
-        lat = np.linspace(-90, 90, 181)
-        lon2d, lat2d = np.meshgrid(lon, lat)
+    def _on_frame_ready(self, image, canvas_size, map_rect, key, elapsed_ms):
+        self.quality.record(elapsed_ms)
+        # an atlas that arrived meanwhile wins over a late live frame
+        if self._atlas is None or not self._atlas.matches(key[1], key[2]):
+            self._set_frame(image, canvas_size, map_rect, key)
+            self.update()
+        self._render_pending = False
 
-        # Convert latitude to radians
-        lat_rad = np.deg2rad(lat2d)
+    def _on_render_failed(self, key):
+        self._render_pending = False
 
-        # Calculate solar hour angle (radians)
-        hour_angle_deg = (decimal_utc - 12) * 15 + lon2d
-        hour_angle_rad = np.deg2rad(hour_angle_deg)
+    def _set_frame(self, image, canvas_size, map_rect, key):
+        self._pixmap = QPixmap.fromImage(image)
+        self._frame_size = canvas_size
+        self._frame_rect = map_rect
+        self._frame_key = key
 
-        # Calculate cosine of solar zenith angle
-        cos_zenith = np.sin(lat_rad) * np.sin(decl) + np.cos(lat_rad) * np.cos(decl) * np.cos(hour_angle_rad)
+    def _map_target(self):
+        # map rect in widget coordinates, frames may be rendered at another scale
+        x, y, w, h = self._frame_rect
+        sx = self.width() / self._frame_size[0]
+        sy = self.height() / self._frame_size[1]
+        return QRectF(x * sx, y * sy, w * sx, h * sy)
 
-        # Plot terminator line: cos value 0 means sun at horizon
-        cs_ori = self.ax.contour(
-            lon, lat, cos_zenith,
-            levels=[0],
-            colors='#808080',
-            linewidths=2,
-            alpha=0,
-            transform=ccrs.PlateCarree()
-        )
+    def map_width(self) -> float:
+        """On-screen width of the map area in widget pixels."""
+        if self._pixmap is None:
+            return 0.0
+        return self._map_target().width()
 
-        # Create latitude mask (retain only latitudes >=30)
-        lat_mask = lat2d >= 30
-        cos_zenith_masked = np.where(lat_mask, cos_zenith, np.nan)
-        cs = self.ax.contour(
-            lon, lat, cos_zenith_masked,
-            levels=[0],
-            colors='#808080',
-            linewidths=2,
-            transform=ccrs.PlateCarree()
-        )
+    def lonlat_to_point(self, lon, lat):
+        # PlateCarree is linear in lon/lat over the map rect
+        target = self._map_target()
+        lon_min, lon_max, lat_min, lat_max = MAP_EXTENT
+        x = target.left() + (lon - lon_min) / (lon_max - lon_min) * target.width()
+        y = target.top() + (lat_max - lat) / (lat_max - lat_min) * target.height()
+        return QPointF(x, y)
 
-        # Extract all contour paths
-        paths = []
-        for segs in cs_ori.allsegs:
-            for seg in segs:
-                paths.append(seg)
-
-        base_color = np.array(hex2color('#808080'))
-
-        # Process each path separately for gradient transparency effect
-        for seg in paths:
-            if seg.shape[0] < 2:
-                continue
-            segments = np.stack([seg[:-1], seg[1:]], axis=1)
-            avg_lat = np.mean(segments[:, :, 1], axis=1)
-            alphas = np.clip((avg_lat + 60) / 90, 0.1, 1)
-            segment_colors = np.zeros((len(segments), 4))
-            segment_colors[:, :3] = base_color
-            segment_colors[:, 3] = alphas
-            lc = LineCollection(
-                segments,
-                colors=segment_colors,
-                linewidths=2,
-                transform=ccrs.PlateCarree()
-            )
-            self.ax.add_collection(lc)
-
-        # Darken areas with negative solar altitude angle
-        self.ax.contourf(
-            lon, lat, cos_zenith < 0,
-            levels=[0.5, 1],
-            colors=['#000000'],
-            alpha=0.7,
-            transform=ccrs.PlateCarree()
-        )
+    def draw_map(self):
+        # Get current UTC time information using TimeLocationUtils
+        time_data = get_utc_time()
+        decimal_utc = time_data["decimal_utc"]
+        n = time_data["year_day"]
+        utc_date = time_data["utc_time"].date()
+        size = self._render_size()
 
-        # Get current location using TimeLocationUtils
+        # Get current location using TimeLocationUtils (last known, never blocks)
         loc = get_location()
         if loc:
             self.current_lat, self.current_lon = loc
 
-        # Draw location marker only if unlocked (show_location is True)
-        if self.show_location and self.current_lat and self.current_lon:
-            self.ax.plot(
-                self.current_lon, self.current_lat,
-                marker='o',
-                color='#F57200',
-                markersize=10,
-                markeredgecolor='#FFFFFF',
-                markeredgewidth=2,
-                transform=ccrs.PlateCarree()
-            )
-
-        # Refresh display
-        self.draw()
+        self._ensure_atlas(utc_date, size)
+        if self._atlas is not None and self._atlas.matches(utc_date, size):
+            # Lookup: the frame is already rendered, only a new pixmap if it changed
+            index = self._atlas.frame_index(decimal_utc)
+            key = ("atlas", utc_date, index)
+            if key != self._frame_key:
+                self._set_frame(
+                    frame_to_qimage(self._atlas.frame(index)),
+                    self._atlas.canvas_size, self._atlas.map_rect, key
+                )
+        else:
+            self._request_live_frame(decimal_utc, n, size, ("live", utc_date, size, decimal_utc))
+        self.update()
 
     def update_map(self):
         self.draw_map()
+
+    def resizeEvent(self, event):
+        # the current frame is stretched until the next one at the new size
+        super().resizeEvent(event)
+        self._frame_key = None
+
+    def paintEvent(self, event):
+        if self._pixmap is None and not self._render_pending:
+            self.draw_map()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        if self._pixmap is None:
+            # first frame still rendering in the worker
+            painter.end()
+            return
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawPixmap(self._map_target(), self._pixmap, QRectF(self._pixmap.rect()))
+
+        # Draw location marker only if unlocked (show_location is True)
+        if self.show_location and self.current_lat and self.current_lon:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(QPen(QColor('#FFFFFF'), 2))
+            painter.setBrush(QColor('#F57200'))
+            # markersize 10 pt at 100 dpi, as the matplotlib marker used to be
+            radius = 10 * 100 / 72 / 2
+            painter.drawEllipse(self.lonlat_to_point(self.current_lon, self.current_lat), radius, radius)
+        painter.end()
+
+
+class MapRefreshScheduler(QObject):
+    """
+    Decides when the map really needs redrawing, independently of the 1 s clock.
+    The terminator only moves 0.25 degrees per minute, so we replan only once the
+    subsolar point has shifted by min_shift_deg (or min_shift_px on screen), and
+    do nothing at all while the map is hidden or the window is minimized.
+    """
+    def __init__(self, map_widget, min_shift_deg=0.25, min_shift_px=None, clock=None, parent=None):
+        super().__init__(parent)
+        self.map_widget = map_widget
+        self.min_shift_deg = min_shift_deg
+        self.min_shift_px = min_shift_px
+        self._last_lon = None
+        self._last_year_day = None
+        self._force = False
+
+        # checked on every tick of the shared clock
+        self.clock = clock or get_clock()
+        self.clock.ticked.connect(self.poll)
+
+    def threshold_deg(self) -> float:
+        # a pixel threshold is converted with the current on-screen map width
+        if self.min_shift_px is None:
+            return self.min_shift_deg
+        width = self.map_widget.map_width()
+        if width <= 0:
+            return self.min_shift_deg
+        return self.min_shift_px * 360 / width
+
+    def is_map_visible(self) -> bool:
+        # pages other than the current one in pages_widget are hidden widgets
+        return self.map_widget.isVisible() and not self.map_widget.window().isMinimized()
+
+    def request_refresh(self):
+        """Redraw on the next visible poll even if the terminator did not move."""
+        self._force = True
+        self.poll()
+
+    def poll(self, snapshot=None):
+        if not self.is_map_visible():
+            return
+        time_data = get_utc_time()
+        # the terminator moves with the subsolar point
+        subsolar_lon = subsolar_longitude(time_data["decimal_utc"])
+        year_day = time_data["year_day"]
+        if not self._force and self._last_lon is not None and year_day == self._last_year_day:
+            shift = abs((subsolar_lon - self._last_lon + 180) % 360 - 180)
+            if shift < self.threshold_deg():
+                return
+        self._force = False
+        self._last_lon = subsolar_lon
+        self._last_year_day = year_day
+        self.map_widget.update_map()
@@ -0,0 +1,106 @@
+import csv
+import math
+import os
+import sys
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    # without scipy the nearest city is found by one vectorised scan
+    cKDTree = None
+
+GAZETTEER_NAME = "cities.txt"  # e.g. GeoNames cities500.txt / cities15000.txt
+EARTH_RADIUS_KM = 6371.0
+
+def get_resource_path(relative_path):
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """(n, 3) points on the unit sphere, so euclidean nearest is great-circle nearest"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+def _read_rows(path):
+    # yields (name, latitude, longitude, population) from either a GeoNames
+    # tab-separated dump (no header) or a CSV with name/latitude/longitude columns
+    with open(path, encoding='utf-8', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if "\t" in first:
+            for fields in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(fields) < 15:
+                    continue
+                population = int(fields[14]) if fields[14].isdigit() else 0
+                yield fields[1], float(fields[4]), float(fields[5]), population
+        else:
+            for record in csv.DictReader(f):
+                population = record.get("population") or 0
+                yield record["name"], float(record["latitude"]), float(record["longitude"]), int(population)
+
+class GazetteerGeocoder:
+    """
+    Offline reverse geocoder: nearest city from a local gazetteer file.
+    Coordinates are kept as a compact float32 (n, 3) array of unit-sphere
+    points indexed by a k-d tree (scipy) or scanned with numpy otherwise.
+    """
+    def __init__(self, path=None, min_population=0):
+        self.path = path or get_resource_path(GAZETTEER_NAME)
+        self.min_population = min_population
+        self.names = []
+        self.points = np.empty((0, 3), dtype=np.float32)
+        self._tree = None
+        self._load()
+
+    @property
+    def available(self) -> bool:
+        return len(self.names) > 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            print(f"Gazetteer not found: {self.path}")
+            return
+        names = []
+        latitudes = []
+        longitudes = []
+        try:
+            for name, latitude, longitude, population in _read_rows(self.path):
+                if population < self.min_population:
+                    continue
+                names.append(name)
+                latitudes.append(latitude)
+                longitudes.append(longitude)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading gazetteer {self.path}: {e}")
+            return
+        self.names = names
+        self.points = unit_vectors(latitudes, longitudes).astype(np.float32)
+        if cKDTree is not None and names:
+            self._tree = cKDTree(self.points)
+
+    def nearest(self, latitude: float, longitude: float):
+        """Return (city name, distance in km) of the nearest city, or None if no gazetteer."""
+        if not self.available:
+            return None
+        query = unit_vectors([latitude], [longitude])[0]
+        if self._tree is not None:
+            chord, index = self._tree.query(query)
+        else:
+            # largest dot product = smallest angle
+            index = int(np.argmax(self.points @ query.astype(np.float32)))
+            chord = float(np.linalg.norm(self.points[index] - query))
+        angle = 2 * math.asin(min(chord / 2, 1.0))
+        return self.names[index], angle * EARTH_RADIUS_KM
+
+    def city(self, latitude: float, longitude: float, max_distance_km: float = 100.0):
+        """Nearest city name within max_distance_km, else None."""
+        result = self.nearest(latitude, longitude)
+        if result is None or result[1] > max_distance_km:
+            return None
+        return result[0]
@@ -0,0 +1,71 @@
+import os
+import threading
+from collections import OrderedDict
+
+# read results kept per database file
+CACHED_RESULTS = 256
+
+_caches = {}
+_lock = threading.Lock()
+
+class QueryCache:
+    """
+    LRU map of read results for one database file, shared by every manager
+    and thread using that file. Writers call invalidate(), which bumps the
+    generation and drops all entries; a result read while a write was
+    happening carries the old generation and is not stored.
+    """
+    def __init__(self, max_entries=CACHED_RESULTS):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(True, value) on a hit; (False, generation) on a miss, pass that generation to put"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, self.generation
+
+    def put(self, key, generation, value):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "generation": self.generation,
+            }
+
+def query_cache(db_path):
+    """The QueryCache of db_path (one per file, or per thread for :memory:)"""
+    key = (db_path, threading.get_ident()) if db_path == ":memory:" else os.path.realpath(db_path)
+    with _lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = QueryCache()
+        return cache
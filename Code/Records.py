@@ -0,0 +1,117 @@
+class Record:
+    """
+    Base of the row types returned by the database managers. Values live in
+    __slots__ (no per-row dict); read-only mapping access (record["date"], get,
+    keys, items, copy) is kept so pages written against the old dicts work as
+    is.
+    _aliases maps extra key names onto fields.
+    """
+    __slots__ = ()
+    _aliases = {}
+
+    def _field(self, key):
+        key = self._aliases.get(key, key)
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return key
+
+    def __getitem__(self, key):
+        return getattr(self, self._field(key))
+
+    def __contains__(self, key):
+        return self._aliases.get(key, key) in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    def copy(self):
+        return type(self)(*self.values())
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+
+class PayRecord(Record):
+    """
+    One pay_data row; amount in major units (pounds), see Expdb_manager.
+    Read-only: ExpDBManager's cached reads hand the same records to every
+    caller, to_dict() gives an editable copy.
+    """
+    __slots__ = ("id", "date", "time", "method", "amount", "currency", "category", "payee", "comment")
+
+    def __init__(self, id, date, time, method, amount, currency, category, payee, comment):
+        _set = object.__setattr__
+        _set(self, "id", id)
+        _set(self, "date", date)
+        _set(self, "time", time)
+        _set(self, "method", method)
+        _set(self, "amount", amount)
+        _set(self, "currency", currency)
+        _set(self, "category", category)
+        _set(self, "payee", payee)
+        _set(self, "comment", comment)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"PayRecord is read-only, use to_dict() to change {name}")
+
+    __delattr__ = __setattr__
+
+
+class Task(Record):
+    """
+    One tasks row; the pages call the colour category_color, collected is a
+    bool. The ToDo pages edit tasks in place (task["title"] = ..., update).
+    """
+    __slots__ = ("id", "color", "category", "title", "date", "degree", "description", "collected")
+    _aliases = {"category_color": "color"}
+
+    def __init__(self, id, color, category, title, date, degree, description, collected):
+        self.id = id
+        self.color = color
+        self.category = category
+        self.title = title
+        self.date = date
+        self.degree = degree
+        self.description = description
+        self.collected = bool(collected)
+
+    def __setitem__(self, key, value):
+        setattr(self, self._field(key), value)
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        # row_factory for "SELECT <Task.__slots__> FROM tasks"
+        return cls(*row)
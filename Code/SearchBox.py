@@ -0,0 +1,81 @@
+import html
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QLineEdit
+from UIDesign import UIDesign
+
+# passed to search_pay_data / search_tasks as start and end; they cannot be
+# typed, so marked_html can escape the text first and then turn them into tags
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+def marked_html(text: str) -> str:
+    """A field of a search hit -> rich text with the matched words highlighted"""
+    return (html.escape(text)
+            .replace(MARK_START, UIDesign.SEARCH_MARK_OPEN)
+            .replace(MARK_END, "</span>"))
+
+class SearchBox(QLineEdit):
+    """
+    Search field for search-as-you-type. search_changed(text) is emitted once
+    typing pauses for DEBOUNCE_MS (or at once on Enter), not per keystroke.
+    """
+    search_changed = pyqtSignal(str)
+    DEBOUNCE_MS = 250
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText("Search...")
+        self.setClearButtonEnabled(True)
+        self.setStyleSheet(UIDesign.SEARCH_BOX_STYLE)
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(self.DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.emit_search)
+        # restarting the timer on every edit is the debounce
+        self.textChanged.connect(lambda _: self.debounce.start())
+        self.returnPressed.connect(self.emit_search)
+
+    def emit_search(self):
+        self.debounce.stop()
+        self.search_changed.emit(self.text().strip())
+
+class ResultStream(QObject):
+    """
+    Hands the (record, marked) hits of a search generator to add_hit a CHUNK
+    at a time from the event loop, so the best matches show at once and the
+    box stays responsive while the rest load. start() with the next query's
+    hits drops what is left of the previous one.
+    """
+    finished = pyqtSignal(int)
+    CHUNK = 20
+
+    def __init__(self, add_hit, parent=None):
+        super().__init__(parent)
+        self.add_hit = add_hit
+        self.hits = None
+        self.count = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.next_chunk)
+
+    def start(self, hits):
+        self.stop()
+        self.hits = hits
+        self.count = 0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        if self.hits is not None:
+            self.hits.close()  # releases the query's cursor
+            self.hits = None
+
+    def next_chunk(self):
+        for _ in range(self.CHUNK):
+            hit = next(self.hits, None)
+            if hit is None:
+                self.stop()
+                self.finished.emit(self.count)
+                return
+            self.count += 1
+            self.add_hit(*hit)
@@ -0,0 +1,109 @@
+import math
+
+import contourpy
+import numpy as np
+
+# Twilight bands by how far the sun is below the horizon (degrees), as
+# thresholds on cos(zenith): the sun is 6 degrees down when cos(zenith) = -sin(6)
+TWILIGHT_DEPRESSIONS = {"civil": 6, "nautical": 12, "astronomical": 18}
+TWILIGHT_THRESHOLDS = {name: -math.sin(math.radians(depth)) for name, depth in TWILIGHT_DEPRESSIONS.items()}
+
+# Below this declination (radians) tan(decl) ~ 0 and the terminator turns into
+# two meridians, so we clamp it to keep the closed form finite around equinoxes
+_MIN_DECLINATION = 1e-4
+
+
+def solar_declination(year_day: int) -> float:
+    """Approximate solar declination in radians for a day of the year"""
+    return np.deg2rad(-23.44 * np.cos(2 * np.pi * (year_day + 10) / 365))
+
+
+def subsolar_longitude(decimal_utc: float) -> float:
+    """Longitude (degrees) where the sun is at its highest at this UTC hour"""
+    return -(decimal_utc - 12) * 15
+
+
+def subsolar_point(decimal_utc: float, year_day: int) -> tuple:
+    """(lon, lat) in degrees of the point where the sun is directly overhead"""
+    return subsolar_longitude(decimal_utc), float(np.rad2deg(solar_declination(year_day)))
+
+
+def terminator_latitudes(lons, decimal_utc: float, year_day: int) -> np.ndarray:
+    """
+    Latitude (degrees) of the day/night line for each longitude in lons.
+
+    cos_zenith = sin(lat)sin(decl) + cos(lat)cos(decl)cos(h) is zero when
+    tan(lat) = -cos(h) / tan(decl), so no grid or contouring is needed.
+    """
+    decl = solar_declination(year_day)
+    if abs(decl) < _MIN_DECLINATION:
+        decl = _MIN_DECLINATION if decl >= 0 else -_MIN_DECLINATION
+    hour_angle = np.deg2rad((decimal_utc - 12) * 15 + np.asarray(lons, dtype=float))
+    return np.rad2deg(np.arctan(-np.cos(hour_angle) / np.tan(decl)))
+
+
+def terminator_curve(decimal_utc: float, year_day: int, n_points: int = 361) -> np.ndarray:
+    """The terminator as an (n_points, 2) array of (lon, lat) from -180 to 180"""
+    curve = np.empty((n_points, 2))
+    curve[:, 0] = np.linspace(-180, 180, n_points)
+    curve[:, 1] = terminator_latitudes(curve[:, 0], decimal_utc, year_day)
+    return curve
+
+
+class SolarGrid:
+    """
+    Lookup tables for evaluating cos(zenith) over a fixed lon/lat grid.
+
+    cos_zenith = cos(lat) * cos(decl)cos(h) + sin(lat) * sin(decl), i.e. an
+    outer-product update of two cached latitude vectors by one row per tick.
+    The latitude terms and longitude offsets are computed once here and
+    evaluate() writes into preallocated buffers, so it allocates no arrays.
+    """
+    def __init__(self, step: float = 1.0):
+        self.step = step
+        self.lons = np.linspace(-180, 180, int(round(360 / step)) + 1)
+        self.lats = np.linspace(-90, 90, int(round(180 / step)) + 1)
+
+        # (n_lat, 2) table of [cos(lat), sin(lat)], fixed for the grid lifetime
+        lat_rad = np.deg2rad(self.lats)
+        self._lat_terms = np.column_stack([np.cos(lat_rad), np.sin(lat_rad)])
+        self._lon_rad = np.deg2rad(self.lons)
+
+        # (2, n_lon) per-tick rows [cos(decl)cos(h), sin(decl)], reused in place
+        self._time_terms = np.empty((2, len(self.lons)))
+        self._hour_row = self._time_terms[0]
+        self._decl_row = self._time_terms[1]
+        self.cos_zenith = np.empty((len(self.lats), len(self.lons)))
+
+    @property
+    def shape(self) -> tuple:
+        return self.cos_zenith.shape
+
+    def evaluate(self, decimal_utc: float, year_day: int) -> np.ndarray:
+        """Fill and return self.cos_zenith, shape (len(lats), len(lons))"""
+        decl = float(solar_declination(year_day))
+        np.add(self._lon_rad, math.radians((decimal_utc - 12) * 15), out=self._hour_row)
+        np.cos(self._hour_row, out=self._hour_row)
+        np.multiply(self._hour_row, math.cos(decl), out=self._hour_row)
+        self._decl_row.fill(math.sin(decl))
+        # one matrix product instead of broadcasting, which would need temp buffers
+        np.matmul(self._lat_terms, self._time_terms, out=self.cos_zenith)
+        return self.cos_zenith
+
+    def band_polygons(self, levels) -> list:
+        """
+        Regions of the last evaluate() between each pair of consecutive levels,
+        as one (vertices, codes) pair per band, ready for matplotlib Paths.
+        """
+        generator = contourpy.contour_generator(
+            self.lons, self.lats, self.cos_zenith,
+            fill_type=contourpy.FillType.OuterCode
+        )
+        bands = []
+        for lower, upper in zip(levels[:-1], levels[1:]):
+            points, codes = generator.filled(lower, upper)
+            if points:
+                bands.append((np.concatenate(points), np.concatenate(codes)))
+            else:
+                bands.append((np.empty((0, 2)), np.empty(0, dtype=np.uint8)))
+        return bands
@@ -1,7 +1,10 @@
-import sqlite3
 import os
 import sys
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ConnectionPool import open_shared
+from Records import Task
+from TextSearch import fts_query
 
 DB_NAME = "ToDoLists.db"  # the datbase name, you can choose your own
 
@@ -13,11 +16,12 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 class DBManager:
-    def __init__(self):
-        db_path = get_resource_path(DB_NAME)
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row
-        self._create_table()
+    def __init__(self, db_path=None):
+        db_path = db_path or get_resource_path(DB_NAME)
+        # one shared connection per file, the table is checked when it is opened
+        self.conn, created = open_shared(db_path)
+        if created:
+            self._create_table()
 
     def _create_table(self):
         """
@@ -45,8 +49,42 @@ class DBManager:
         )
         """
         self.conn.execute(sql)
+        # the pages filter and sort by date
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks (date)")
+        self._create_search_index()
         self.conn.commit()
 
+    def _create_search_index(self):
+        # tasks_fts: FTS5 index of title and description (title matches rank
+        # twice as high), no copy of the text, kept in step by triggers
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'").fetchone()
+        if exists:
+            return
+        self.conn.execute("""
+        CREATE VIRTUAL TABLE tasks_fts USING fts5(
+            title, description,
+            content = 'tasks', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """)
+        self.conn.execute("INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+        index_new = """
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        """
+        unindex_old = """
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        """
+        self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN {index_new} END")
+        self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN {unindex_old} END")
+        self.conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks
+        BEGIN {unindex_old} {index_new} END
+        """)
+        # index the tasks saved before the search was added
+        self.conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
     def insert_task(self, data: Dict) -> int:
         """
         Insert a new record and return its auto-incremented id.
@@ -111,26 +149,115 @@ class DBManager:
         self.conn.execute(sql, (task_id,))
         self.conn.commit()
 
-    def fetch_all_tasks(self) -> List[Dict]:
-        """
-        Fetch all tasks, ordered by date ascending, and return as list of dicts.
-        """
-        sql = "SELECT * FROM tasks ORDER BY date ASC"
-        cur = self.conn.execute(sql)
-        rows = cur.fetchall()
-        result = []
-        for row in rows:
-            result.append({
-                "id": row["id"],
-                "color": row["color"],
-                "category": row["category"],
-                "title": row["title"],
-                "date": row["date"],
-                "degree": row["degree"],
-                "description": row["description"],
-                "collected": row["collected"]
-            })
-        return result
+    def fetch_all_tasks(self) -> List[Task]:
+        """
+        Fetch all tasks, ordered by date ascending, as Task records
+        (built directly by the row factory, no intermediate dicts).
+        """
+        sql = f"SELECT {', '.join(Task.__slots__)} FROM tasks ORDER BY date ASC"
+        cur = self.conn.cursor()
+        cur.row_factory = Task.from_row
+        return cur.execute(sql).fetchall()
+
+    @staticmethod
+    def _where(date_from=None, date_to=None, collected=None, color=None, category=None):
+        # filters shared by fetch_tasks, iter_tasks, page_tasks and count_tasks;
+        # date_from and date_to (yyyy-MM-dd) are inclusive
+        conditions, params = [], []
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if collected is not None:
+            conditions.append("collected = ?")
+            params.append(int(collected))
+        if color is not None:
+            conditions.append("color = ?")
+            params.append(color)
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        return " AND ".join(conditions) or "1", params
+
+    def _select(self, where, params, tail="", tail_params=()):
+        sql = f"SELECT {', '.join(Task.__slots__)} FROM tasks WHERE {where} ORDER BY date ASC, id ASC{tail}"
+        cur = self.conn.cursor()
+        cur.row_factory = Task.from_row
+        return cur.execute(sql, (*params, *tail_params))
+
+    def fetch_tasks(self, **filters) -> List[Task]:
+        """
+        Fetch the tasks matching the filters (date_from, date_to, collected,
+        color, category), ordered by date, so the pages no longer load every
+        task to pick a few.
+        """
+        return self._select(*self._where(**filters)).fetchall()
+
+    def iter_tasks(self, batch_size: int = 200, **filters) -> Iterator[Task]:
+        """Like fetch_tasks, reading batch_size rows at a time"""
+        cur = self._select(*self._where(**filters))
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    @staticmethod
+    def page_key(task: Task) -> Tuple[str, int]:
+        return task.date, task.id
+
+    def page_tasks(self, after_key: Optional[Tuple] = None, limit: int = 50, **filters) -> List[Task]:
+        """
+        Up to limit tasks after after_key (page_key of the last task of the
+        previous page, None for the first page), seeking through the date
+        index instead of skipping rows with OFFSET.
+        """
+        where, params = self._where(**filters)
+        if after_key is not None:
+            where += " AND date >= ? AND (date, id) > (?, ?)"
+            params += [after_key[0], *after_key]
+        return self._select(where, params, " LIMIT ?", (limit,)).fetchall()
+
+    def count_tasks(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM tasks WHERE {where}", params).fetchone()[0]
+
+    def exists_tasks(self, **filters) -> bool:
+        where, params = self._where(**filters)
+        return bool(self.conn.execute(f"SELECT EXISTS (SELECT 1 FROM tasks WHERE {where})", params).fetchone()[0])
+
+    def search_tasks(self, text: str, limit: int = 100, start: str = "[", end: str = "]",
+                     batch_size: int = 20) -> Iterator[Tuple[Task, Dict[str, str]]]:
+        """
+        Tasks whose title or description match the words of text (each as a
+        prefix, see fts_query), best match first. Yields (task, marked) pairs
+        as they are read; marked holds the title and a snippet of the
+        description with the matching words between start and end.
+        """
+        query = fts_query(text)
+        if query is None:
+            return
+        columns = ", ".join("t." + name for name in Task.__slots__)
+        sql = f"""
+        SELECT {columns}, highlight(tasks_fts, 0, ?, ?), snippet(tasks_fts, 1, ?, ?, '…', 12)
+          FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+         WHERE tasks_fts MATCH ?
+         ORDER BY rank
+         LIMIT ?
+        """
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, (start, end, start, end, query, limit))
+        width = len(Task.__slots__)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield Task(*row[:width]), {"title": row[width] or "", "description": row[width + 1] or ""}
 
     def close(self):
-        self.conn.close()
+        # the connection is shared with the other managers, ConnectionPool closes it at exit
+        self.conn = None
@@ -0,0 +1,11 @@
+def fts_query(text):
+    """
+    Search box text -> FTS5 MATCH expression: every word must match, the last
+    one (still being typed) and the others as prefixes; quotes keep FTS5
+    operators in the text literal. None when there is nothing to search for.
+    """
+    words = [word.replace('"', '') for word in text.split()]
+    words = [word for word in words if any(ch.isalnum() for ch in word)]
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
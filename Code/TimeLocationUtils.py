@@ -1,76 +1,228 @@
-import geocoder
-from datetime import datetime, timezone, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-from PyQt6.QtCore import QDate
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from PyQt6.QtCore import QDate, QObject, QTimer, pyqtSignal
+from Geodb_manager import GeoDBManager
+from LocationProviders import default_provider_chain
+
+class ClockSnapshot:
+    """Everything the app needs to know about 'now', computed once per tick."""
+    __slots__ = ("utc", "local", "monotonic", "time_str", "date_str", "utc_info", "today")
+
+    def __init__(self, utc: datetime, monotonic: float):
+        self.utc = utc
+        self.local = utc.astimezone()
+        self.monotonic = monotonic
+        # Manually handle date part for cross-platform compatibility
+        self.time_str = self.local.strftime("%H:%M")
+        self.date_str = f"{self.local.year}/{self.local.month}/{self.local.day}"
+        self.utc_info = {
+            "utc_time": utc,
+            "decimal_utc": utc.hour + utc.minute/60,
+            "year_day": utc.timetuple().tm_yday
+        }
+        self.today = self.local.date()
+
+class ClockService(QObject):
+    """
+    The app's single time source. Once per second (interval_ms) it takes one
+    reading of the clock and publishes a ClockSnapshot; get_current_time,
+    get_utc_time and get_today_date all read that snapshot. Without a running
+    timer (no event loop) a snapshot older than one interval is refreshed on read.
+    now (aware UTC datetime) and monotonic are injectable for tests/benchmarks.
+    """
+    ticked = pyqtSignal(object)
+    minute_changed = pyqtSignal(object)
+    date_changed = pyqtSignal(object)
+
+    def __init__(self, now=None, monotonic=None, interval_ms=1000, parent=None):
+        super().__init__(parent)
+        self.now = now or (lambda: datetime.now(timezone.utc))
+        self.monotonic = monotonic or time.monotonic
+        self.interval_ms = interval_ms
+        self.timer = None
+        self.snapshot = ClockSnapshot(self.now(), self.monotonic())
+
+    def start(self):
+        """Start ticking; call from the GUI thread once the app exists."""
+        if self.timer is None:
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self.tick)
+        if not self.timer.isActive():
+            self.timer.start(self.interval_ms)
+
+    def current(self) -> ClockSnapshot:
+        snapshot = self.snapshot
+        if (self.timer is None or not self.timer.isActive()) and \
+                self.monotonic() - snapshot.monotonic >= self.interval_ms / 1000:
+            snapshot = self.tick()
+        return snapshot
+
+    def tick(self) -> ClockSnapshot:
+        previous = self.snapshot
+        snapshot = ClockSnapshot(self.now(), self.monotonic())
+        self.snapshot = snapshot
+        self.ticked.emit(snapshot)
+        if snapshot.time_str != previous.time_str or snapshot.today != previous.today:
+            self.minute_changed.emit(snapshot)
+        if snapshot.today != previous.today:
+            self.date_changed.emit(snapshot)
+        return snapshot
+
+_clock = None
+
+def get_clock() -> ClockService:
+    global _clock
+    if _clock is None:
+        _clock = ClockService()
+    return _clock
+
+def set_clock(clock: ClockService):
+    """Install another clock, e.g. a ClockService with a fake now for tests."""
+    global _clock
+    _clock = clock
+
+class LocationNotifier(QObject):
+    """
+    Signals of LocationCache. They are emitted from the resolver thread, so
+    receivers in the GUI thread get them queued.
+    """
+    location_changed = pyqtSignal(float, float)
+    city_changed = pyqtSignal(str)
 
 class LocationCache:
+    """
+    Last known location and city. Reading them never blocks: a stale value
+    starts a refresh in a background thread and the old value is returned,
+    the notifier signals when new coordinates or a new city arrive.
+    Coordinates and city names come from a ProviderChain (see LocationProviders).
+    """
     _instance = None
     _last_update = None
+    _last_attempt = None
     _current_location = ()  # default coordinate
     _current_city = "Unknown"  # default city name
+    # expiries are in monotonic seconds, so clock changes do not affect them
+    _refresh_interval = 3600
+    # wait before trying again after a failed refresh
+    _retry_delay = 60
+    _executor = None
+    _pending = None
+    _lock = threading.Lock()
+    _notifier = None
+    _geo_cache = None
+    _providers = None
+    # "fallback": Nominatim first, local gazetteer when it fails (offline);
+    # "primary": local gazetteer first, Nominatim only when it has no answer
+    gazetteer_mode = "fallback"
+    # (lat, lon) or (lat, lon, city) to use instead of the IP lookup
+    fixed_location = None
 
     def __new__(cls):
         if not cls._instance:
             cls._instance = super().__new__(cls)
+            cls._instance._load_last_known()
         return cls._instance
 
+    @property
+    def geo_cache(self) -> GeoDBManager:
+        if LocationCache._geo_cache is None:
+            LocationCache._geo_cache = GeoDBManager()
+        return LocationCache._geo_cache
+
+    @property
+    def providers(self):
+        # built on first use from gazetteer_mode and fixed_location
+        if LocationCache._providers is None:
+            LocationCache._providers = default_provider_chain(self.gazetteer_mode, self.fixed_location)
+        return LocationCache._providers
+
+    @classmethod
+    def set_providers(cls, chain):
+        """Replace the provider chain, e.g. with a stub server for tests."""
+        cls._providers = chain
+
+    def _load_last_known(self):
+        # start from where we were last time, so an offline start still shows a
+        # city; the first refresh replaces it
+        try:
+            last = self.geo_cache.last_known()
+        except Exception as e:
+            print(f"Geocode cache unavailable: {e}")
+            return
+        if last:
+            latitude, longitude, city = last
+            LocationCache._current_location = (latitude, longitude)
+            LocationCache._current_city = city
+
+    @property
+    def notifier(self) -> LocationNotifier:
+        # created on first use, which is on the GUI thread
+        if LocationCache._notifier is None:
+            LocationCache._notifier = LocationNotifier()
+        return LocationCache._notifier
+
     @property
     def location(self):
-        now = datetime.now()
-        if not self._last_update or (now - self._last_update) > timedelta(hours=1):
-            self._refresh_location()
+        self._refresh_if_stale()
         return self._current_location
 
     @property
     def city(self):
-        now = datetime.now()
-        if not self._last_update or (now - self._last_update) > timedelta(hours=1):
-            self._refresh_location()
+        self._refresh_if_stale()
         return self._current_city
 
+    def _refresh_if_stale(self):
+        now = get_clock().monotonic()
+        if self._last_update is not None and (now - self._last_update) <= self._refresh_interval:
+            return
+        if self._last_attempt is not None and (now - self._last_attempt) < self._retry_delay:
+            return
+        self.refresh()
+
+    def refresh(self):
+        """Start a background refresh unless one is already running; returns its future."""
+        with LocationCache._lock:
+            if LocationCache._pending is not None and not LocationCache._pending.done():
+                return LocationCache._pending
+            if LocationCache._executor is None:
+                LocationCache._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="location")
+            # make sure the notifier exists before the worker may emit on it
+            self.notifier
+            LocationCache._last_attempt = get_clock().monotonic()
+            LocationCache._pending = LocationCache._executor.submit(self._refresh_location)
+            return LocationCache._pending
+
     def _refresh_location(self):
-        try:
-            if g := geocoder.ip('me'):
-                new_lat, new_lon = g.latlng
-                # only update city infor when coordinate changes
-                if (new_lat, new_lon) != self._current_location:
-                    self._current_location = (new_lat, new_lon)
-                    self._current_city = self._get_city_name(new_lat, new_lon)
-                self._last_update = datetime.now()
-        except Exception as e:
-            print(f"Location service unavailable: {str(e)}")
+        # runs in the resolver thread; the provider chain applies the deadlines,
+        # backoff and circuit breakers, so a dead service costs no waiting here
+        location = self.providers.locate()
+        if location is None:
+            print("Location service unavailable, keeping the last known location")
+            return
+        new_lat, new_lon = location
+        # only update city infor when coordinate changes
+        if (new_lat, new_lon) != self._current_location:
+            LocationCache._current_location = (new_lat, new_lon)
+            self.notifier.location_changed.emit(new_lat, new_lon)
+            new_city = self._resolve_city(new_lat, new_lon)
+            if new_city != self._current_city:
+                LocationCache._current_city = new_city
+                self.notifier.city_changed.emit(new_city)
+        LocationCache._last_update = get_clock().monotonic()
 
-    def _get_city_name(self, latitude, longitude):
-        """Reverse geocode coordinates to retrieve city name"""
-        geolocator = Nominatim(user_agent="geo_locator_app")
-        try:
-            location = geolocator.reverse(
-                (latitude, longitude),
-                exactly_one=True,
-                language='en'
-            )
-
-            if location:
-                address = location.raw.get('address', {})
-                # Search through administrative levels in order of priority
-                city_keys = [
-                    'city', 'town', 'village',
-                    'municipality', 'county',
-                    'state', 'region'
-                ]
-                for key in city_keys:
-                    if key in address:
-                        return address[key]
-                return address.get('state', 'Unknown')
-            return 'Unknown'
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            print(f"Geocoding service error: {e}")
-            return 'Unknown'
-        except Exception as e:
-            print(f"Unknown error: {e}")
-            return 'Unknown'
+    def _resolve_city(self, latitude, longitude):
+        # cache first, then the providers; a stale cache entry beats Unknown
+        city = self.geo_cache.get_city(latitude, longitude)
+        if city is not None:
+            return city
+        city = self.providers.reverse(latitude, longitude)
+        if city:
+            self.geo_cache.put_city(latitude, longitude, city)
+            return city
+        return self.geo_cache.get_city(latitude, longitude, allow_expired=True) or 'Unknown'
 
 def get_location() -> tuple:
     return LocationCache().location
@@ -78,24 +230,18 @@ def get_location() -> tuple:
 def get_city() -> str:
     return LocationCache().city
 
+def get_location_notifier() -> LocationNotifier:
+    return LocationCache().notifier
+
 def get_current_time() -> tuple:
     """Cross-platform time formatting"""
-    now = datetime.now()
-    # Manually handle date part for cross-platform compatibility
-    time_str = now.strftime("%H:%M")
-    year = now.year
-    month = now.month  # Retrieve integer values without leading zeros
-    day = now.day
-    date_str = f"{year}/{month}/{day}"
-    return time_str, date_str
+    snapshot = get_clock().current()
+    return snapshot.time_str, snapshot.date_str
 
 def get_utc_time() -> dict:
-    utc_now = datetime.now(timezone.utc)
-    return {
-        "utc_time": utc_now,
-        "decimal_utc": utc_now.hour + utc_now.minute/60,
-        "year_day": utc_now.timetuple().tm_yday
-    }
+    # shared by all callers of this tick, do not modify
+    return get_clock().current().utc_info
+
 def get_today_date() -> QDate:
-    now = datetime.now()
-    return QDate(now.year, now.month, now.day)
\ No newline at end of file
+    today = get_clock().current().today
+    return QDate(today.year, today.month, today.day)
@@ -7,7 +7,9 @@ from PyQt6.QtWidgets import (
     QScrollArea, QGridLayout, QFrame, QDialog, QLineEdit, QTextEdit,
     QRadioButton, QButtonGroup, QDateEdit, QHBoxLayout, QVBoxLayout
 )
+from SearchBox import MARK_END, MARK_START, ResultStream, SearchBox, marked_html
 from Tddb_manager import DBManager
+from TimeLocationUtils import get_today_date
 from UIDesign import UIDesign  # 引入统一样式模块
 
 
@@ -272,9 +274,9 @@ class ToDoEditDialog(QDialog):
             try:
                 self.date_edit.setDate(QDate(int(y), int(m), int(d)))
             except:
-                self.date_edit.setDate(QDate.currentDate())
+                self.date_edit.setDate(get_today_date())
         else:
-            self.date_edit.setDate(QDate.currentDate())
+            self.date_edit.setDate(get_today_date())
         #degree
         self.degree_label = QLabel("Degree:", self)
         self.degree_label.setGeometry(10, 100, 50, 20)
@@ -367,7 +369,7 @@ class RecentPage(QWidget):
         self.setStyleSheet(UIDesign.PAGE_BG)
 
         self.db = DBManager()
-        self.today = QDate.currentDate()
+        self.today = get_today_date()
         self.selected_date = self.today
         self.day_count = 7
         self.offset = 3
@@ -432,20 +434,8 @@ class RecentPage(QWidget):
         self.set_date_label_text()
 
     def load_tasks_from_db(self):
-        rows = self.db.fetch_all_tasks()
-        self.all_tasks.clear()
-        for row in rows:
-            data = {
-                "id": row["id"],
-                "category_color": row["color"],
-                "category": row["category"],
-                "title": row["title"],
-                "date": row["date"],
-                "degree": row["degree"],
-                "description": row["description"],
-                "collected": bool(row["collected"])
-            }
-            self.all_tasks.append(data)
+        # Task records; the cards read the colour as "category_color"
+        self.all_tasks[:] = self.db.fetch_all_tasks()
         self.do_date_filter(self.selected_date)
 
     def update_date_buttons(self):
@@ -593,24 +583,13 @@ class CollectionPage(QWidget):
         self.load_tasks()
 
     def load_tasks(self):
-        rows = self.db.fetch_all_tasks()
+        rows = self.db.fetch_tasks(collected=True)
         self.todo_list.clear()
         self.card_widgets.clear()
-        for row in rows:
-            if row["collected"] == 1:
-                data = {
-                    "id": row["id"],
-                    "category_color": row["color"],
-                    "category": row["category"],
-                    "title": row["title"],
-                    "date": row["date"],
-                    "degree": row["degree"],
-                    "description": row["description"],
-                    "collected": True
-                }
-                self.todo_list.append(data)
-                card = ToDoCard(data, parent=self.cards_widget, parent_page=self)
-                self.card_widgets.append(card)
+        for task in rows:
+            self.todo_list.append(task)
+            card = ToDoCard(task, parent=self.cards_widget, parent_page=self)
+            self.card_widgets.append(card)
         self.refresh_cards()
 
     def refresh_cards(self):
@@ -647,7 +626,7 @@ class CollectionPage(QWidget):
             self.after_db_changed()
 
     def open_add_dialog(self):
-        default_data = {"date": QDate.currentDate().toString("yyyy-MM-dd")}
+        default_data = {"date": get_today_date().toString("yyyy-MM-dd")}
         dialog = ToDoEditDialog(todo_data=default_data, parent=self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             new_data = dialog.todo_data
@@ -701,19 +680,9 @@ class AllPage(QWidget):
         rows = self.db.fetch_all_tasks()
         self.todo_list.clear()
         self.card_widgets.clear()
-        for row in rows:
-            data = {
-                "id": row["id"],
-                "category_color": row["color"],
-                "category": row["category"],
-                "title": row["title"],
-                "date": row["date"],
-                "degree": row["degree"],
-                "description": row["description"],
-                "collected": bool(row["collected"])
-            }
-            self.todo_list.append(data)
-            card = ToDoCard(data, parent=self.cards_widget, parent_page=self)
+        for task in rows:
+            self.todo_list.append(task)
+            card = ToDoCard(task, parent=self.cards_widget, parent_page=self)
             self.card_widgets.append(card)
         self.refresh_cards()
 
@@ -751,7 +720,7 @@ class AllPage(QWidget):
             self.after_db_changed()
 
     def open_add_dialog(self):
-        default_data = {"date": QDate.currentDate().toString("yyyy-MM-dd")}
+        default_data = {"date": get_today_date().toString("yyyy-MM-dd")}
         dialog = ToDoEditDialog(todo_data=default_data, parent=self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             new_data = dialog.todo_data
@@ -792,6 +761,100 @@ class AllPage(QWidget):
             self.after_db_changed()
 
 
+##############################################################################
+# SearchPage: tasks matching the search box, best match first
+##############################################################################
+class SearchPage(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(820, 600)
+        self.setStyleSheet(UIDesign.PAGE_BG)
+        self.db = DBManager()
+        self.search_text = ""
+
+        self.title_label = QLabel("Search", self)
+        self.title_label.setGeometry(10, 10, 700, 30)
+        self.title_label.setStyleSheet(UIDesign.SEARCH_TITLE_LABEL_STYLE)
+
+        self.scroll_area = QScrollArea(self)
+        self.scroll_area.setGeometry(10, 50, 800, 440)
+        self.scroll_area.setStyleSheet("background-color: #3c3c3c;")
+        self.scroll_area.setWidgetResizable(True)
+        self.cards_widget = QWidget()
+        self.grid_layout = QGridLayout(self.cards_widget)
+        self.grid_layout.setContentsMargins(10, 10, 10, 10)
+        self.grid_layout.setHorizontalSpacing(30)
+        self.grid_layout.setVerticalSpacing(20)
+        self.grid_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        for c in range(4):
+            self.grid_layout.setColumnMinimumWidth(c, 160)
+        self.scroll_area.setWidget(self.cards_widget)
+        self.card_widgets = []
+
+        # cards are added a chunk at a time as the query is read
+        self.stream = ResultStream(self.add_hit, self)
+        self.stream.finished.connect(self.on_search_finished)
+
+    def search(self, text: str):
+        self.search_text = text
+        self.stream.stop()
+        while self.grid_layout.count() > 0:
+            item = self.grid_layout.takeAt(0)
+            if item.widget():
+                item.widget().setParent(None)
+        self.card_widgets.clear()
+        self.title_label.setText(f"Search: {text}")
+        self.stream.start(self.db.search_tasks(text, start=MARK_START, end=MARK_END))
+
+    def add_hit(self, task, marked):
+        card = ToDoCard(task, parent=self.cards_widget, parent_page=self)
+        # the matched words; the title keeps its plain (elided) text if it did not match
+        if MARK_START in marked["title"]:
+            card.title_label.setTextFormat(Qt.TextFormat.RichText)
+            card.title_label.setText(marked_html(marked["title"]))
+        card.desc_label.setTextFormat(Qt.TextFormat.RichText)
+        card.desc_label.setText(marked_html(marked["description"]))
+        i = len(self.card_widgets)
+        self.grid_layout.addWidget(card, i // 4, i % 4)
+        self.card_widgets.append(card)
+
+    def on_search_finished(self, count):
+        self.title_label.setText(f"Search: {self.search_text}   ({count} found)")
+
+    def refresh_view(self):
+        if self.search_text:
+            self.search(self.search_text)
+
+    def remove_card(self, card_widget):
+        task_id = card_widget.todo_data.get("id")
+        if task_id:
+            self.db.delete_task(task_id)
+        self.search(self.search_text)
+
+        if hasattr(self, 'after_db_changed'):
+            self.after_db_changed()
+
+    def open_edit_dialog(self, todo_data, card_widget):
+        dialog = ToDoEditDialog(todo_data=todo_data.copy(), parent=self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            todo_data.update(dialog.todo_data)
+            task_id = todo_data.get("id")
+            if task_id:
+                self.db.update_task(task_id, {
+                    "color": todo_data["category_color"],
+                    "category": todo_data["category"],
+                    "title": todo_data["title"],
+                    "date": todo_data["date"],
+                    "degree": todo_data["degree"],
+                    "description": todo_data["description"],
+                    "collected": 1 if todo_data["collected"] else 0
+                })
+            self.search(self.search_text)
+
+        if hasattr(self, 'after_db_changed'):
+            self.after_db_changed()
+
+
 ##############################################################################
 # 新增：CategoryPage —— 根据特定 color 和 category 过滤待办事项
 ##############################################################################
@@ -832,24 +895,13 @@ class CategoryPage(QWidget):
         self.load_tasks()
 
     def load_tasks(self):
-        rows = self.db.fetch_all_tasks()
+        rows = self.db.fetch_tasks(color=self.filter_color, category=self.filter_category)
         self.todo_list.clear()
         self.card_widgets.clear()
-        for row in rows:
-            if row["color"] == self.filter_color and row["category"] == self.filter_category:
-                data = {
-                    "id": row["id"],
-                    "category_color": row["color"],
-                    "category": row["category"],
-                    "title": row["title"],
-                    "date": row["date"],
-                    "degree": row["degree"],
-                    "description": row["description"],
-                    "collected": bool(row["collected"])
-                }
-                self.todo_list.append(data)
-                card = ToDoCard(data, parent=self.cards_widget, parent_page=self)
-                self.card_widgets.append(card)
+        for task in rows:
+            self.todo_list.append(task)
+            card = ToDoCard(task, parent=self.cards_widget, parent_page=self)
+            self.card_widgets.append(card)
         self.refresh_cards()
 
     def refresh_cards(self):
@@ -884,7 +936,7 @@ class CategoryPage(QWidget):
 
     def open_add_dialog(self):
         default_data = {
-            "date": QDate.currentDate().toString("yyyy-MM-dd"),
+            "date": get_today_date().toString("yyyy-MM-dd"),
             "category": self.filter_category if self.filter_category else "",
             "category_color": self.filter_color if self.filter_color else "#FF6666"
         }
@@ -956,26 +1008,16 @@ class FuturePage(QWidget):
         self.load_tasks()
 
     def load_tasks(self):
-        rows = self.db.fetch_all_tasks()
+        today = get_today_date()
+        rows = self.db.fetch_tasks(date_from=today.toString("yyyy-MM-dd"))
         self.todo_list.clear()
         self.card_widgets.clear()
 
-        today = QDate.currentDate()
-        for row in rows:
-            task_date = QDate.fromString(row["date"], "yyyy-MM-dd")
+        for task in rows:
+            task_date = QDate.fromString(task["date"], "yyyy-MM-dd")
             if task_date.isValid() and task_date >= today:
-                data = {
-                    "id": row["id"],
-                    "category_color": row["color"],
-                    "category": row["category"],
-                    "title": row["title"],
-                    "date": row["date"],
-                    "degree": row["degree"],
-                    "description": row["description"],
-                    "collected": bool(row["collected"])
-                }
-                self.todo_list.append(data)
-                card = ToDoCard(data, parent=self.cards_widget, parent_page=self)
+                self.todo_list.append(task)
+                card = ToDoCard(task, parent=self.cards_widget, parent_page=self)
                 self.card_widgets.append(card)
 
         self.refresh_cards()
@@ -1014,7 +1056,7 @@ class FuturePage(QWidget):
             self.after_db_changed()
 
     def open_add_dialog(self):
-        default_data = {"date": QDate.currentDate().toString("yyyy-MM-dd")}
+        default_data = {"date": get_today_date().toString("yyyy-MM-dd")}
         dialog = ToDoEditDialog(todo_data=default_data, parent=self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             new_data = dialog.todo_data
@@ -1108,15 +1150,20 @@ class Todo_MainWindow(QMainWindow):
         self.leftButtonGroup.addButton(self.all_btn)
         self.leftButtonGroup.addButton(self.future_btn)
 
+        # search title and description as you type
+        self.search_box = SearchBox(self.left_panel)
+        self.search_box.setGeometry(10, 218, 160, 28)
+        self.search_box.search_changed.connect(self.on_search_changed)
+
         # Category label
         self.category_label = QLabel("Category", self.left_panel)
-        self.category_label.setGeometry(10, 230, 160, 30)
+        self.category_label.setGeometry(10, 250, 160, 26)
         self.category_label.setStyleSheet("color: white; font-size: 18px;")
 
         # QScrollArea to store category label
         self.category_scroll = QScrollArea(self.left_panel)
         self.category_scroll.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.category_scroll.setGeometry(0, 270, 180, 250)
+        self.category_scroll.setGeometry(0, 280, 180, 240)
         self.category_scroll.setWidgetResizable(True)
         self.category_scroll.setStyleSheet("background: transparent; border: none;")
         self.category_widget = QWidget()
@@ -1126,7 +1173,7 @@ class Todo_MainWindow(QMainWindow):
         self.category_scroll.setWidget(self.category_widget)
         # store the category buttons
         self.category_buttons = {}
-        self.category_start_y = 270
+        self.category_start_y = 280
 
     ###### right QStackedWidget
         self.pages_widget = QStackedWidget(self.central_widget)
@@ -1154,6 +1201,11 @@ class Todo_MainWindow(QMainWindow):
         self.future_page.after_db_changed = self.refresh_all_views
         self.pages_widget.addWidget(self.future_page)
 
+        self.search_page = SearchPage()
+        self.search_page.db = self.db
+        self.search_page.after_db_changed = self.refresh_all_views
+        self.pages_widget.addWidget(self.search_page)
+
         # Category
         self.category_page = None
 
@@ -1165,9 +1217,10 @@ class Todo_MainWindow(QMainWindow):
         self.update_category_buttons()
 
     def clean_old_tasks(self):
-        today = QDate.currentDate()
+        today = get_today_date()
         cutoff = today.addDays(-31)
-        tasks = self.db.fetch_all_tasks()
+        # only the candidates; the date check below still skips malformed dates
+        tasks = self.db.fetch_tasks(date_to=cutoff.addDays(-1).toString("yyyy-MM-dd"))
         for task in tasks:
             task_date = QDate.fromString(task["date"], "yyyy-MM-dd")
             if task_date.isValid() and task_date < cutoff:
@@ -1185,6 +1238,19 @@ class Todo_MainWindow(QMainWindow):
         self.refresh_all_views()
         super().showEvent(event)
 
+    def on_search_changed(self, text: str):
+        if text:
+            self.search_page.search(text)
+            self.pages_widget.setCurrentWidget(self.search_page)
+            # no left button stands for the search page
+            self.leftButtonGroup.setExclusive(False)
+            for btn in self.leftButtonGroup.buttons():
+                btn.setChecked(False)
+            self.leftButtonGroup.setExclusive(True)
+        elif self.pages_widget.currentWidget() is self.search_page:
+            self.recent_btn.setChecked(True)
+            self.switch_page(0)
+
     def switch_page(self, index: int):
         self.pages_widget.setCurrentIndex(index)
 
@@ -729,3 +729,18 @@ class UIDesign:
     EXP_CATEGORY_SCROLL_STYLE = "background: transparent; border: none;"
     EXP_PAGES_WIDGET_STYLE = "background-color: #4c4c4c;"
 
+    # =============================================================
+    # Search box and results (SearchBox.py, used by ToDo and Expenditure)
+    # =============================================================
+    SEARCH_BOX_STYLE = """
+    QLineEdit {
+        background-color: #222;
+        color: white;
+        font-size: 14px;
+        border-radius: 5px;
+        padding: 3px;
+    }
+    """
+    SEARCH_TITLE_LABEL_STYLE = "color: white; font-size: 18px;"
+    # matched words in results; marked_html closes the span
+    SEARCH_MARK_OPEN = "<span style='background-color: #3399FF; color: white;'>"
@@ -0,0 +1,20 @@
+"""
+Time one nearest-city lookup of the offline geocoder.
+
+Run from the Code folder:  python bench/geocoder_nearest.py [gazetteer] [lat lon]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from OfflineGeocoder import GazetteerGeocoder
+
+
+if __name__ == "__main__":
+    geocoder = GazetteerGeocoder(sys.argv[1] if len(sys.argv) in (2, 4) else None)
+    lat, lon = (float(sys.argv[-2]), float(sys.argv[-1])) if len(sys.argv) > 2 else (53.41, -2.98)
+    start = time.perf_counter()
+    result = geocoder.nearest(lat, lon)
+    print(f"{len(geocoder.names)} cities, nearest {result} in {(time.perf_counter() - start) * 1e6:.0f} us")
@@ -0,0 +1,51 @@
+"""
+Time a statement import into a new temporary database (never the app's
+expenses.db), optionally of a synthetic CSV statement.
+
+Run from the Code folder:
+    python bench/import_statement.py --sample big.csv 1000000   -> write a sample statement
+    python bench/import_statement.py statement.csv|statement.ofx
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Exp_Import import ExpenseImporter
+from ConnectionPool import close_shared
+from Expdb_manager import DB_NAME, ExpDBManager
+
+
+def write_sample_csv(path, rows):
+    payees = ["Tesco", "Amazon", "Salary", "Rent", "Cafe", "Bookshop"]
+    with open(path, "w", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Time", "Amount", "Description", "Memo"])
+        for i in range(rows):
+            writer.writerow([
+                f"{2020 + i % 6}-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"{i % 24:02d}:{i % 60:02d}",
+                f"{random.uniform(-200, 100):.2f}", random.choice(payees), f"row {i}"
+            ])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--sample":
+        write_sample_csv(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, DB_NAME)
+        try:
+            importer = ExpenseImporter(ExpDBManager(path))
+            start = time.perf_counter()
+            ids = importer.import_file(sys.argv[1])
+            print(f"Imported {len(ids)} records in {time.perf_counter() - start:.1f} s, skipped {importer.skipped}")
+            importer.manager.close()
+        finally:
+            close_shared(path)
@@ -0,0 +1,128 @@
+"""
+Per-frame cost of the map's day/night overlay.
+
+Compares the old single night shade (meshgrid + cos_zenith + contourf) with
+the current shade (SolarGrid + night and three twilight bands + subsolar
+marker, all updated in place). Only the overlay is timed: both variants draw
+into the same offscreen Agg canvas, like the overlay in MapRenderer.
+Then times a full MapRenderer.render() frame at every quality tier.
+
+Run from the Code folder:  python bench/map_overlay.py [frames]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cartopy.crs as ccrs
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+
+from MapRenderer import QUALITY_TIERS, MapRenderer
+from SolarGeometry import SolarGrid, TWILIGHT_THRESHOLDS, solar_declination, subsolar_point
+
+
+def _make_axes():
+    fig = Figure(figsize=(10, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection=ccrs.PlateCarree())
+    ax.set_position([0.1, 0.3, 0.8, 0.6])
+    ax.set_extent([-180, 180, -60, 90], crs=ccrs.PlateCarree())
+    canvas.draw()
+    return canvas, ax
+
+
+def _frame_times(setup, frames):
+    """Call setup() once, then time the returned per-frame callable"""
+    frame = setup()
+    frame(0)  # warm-up
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        frame(i)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def legacy_overlay():
+    canvas, ax = _make_axes()
+
+    def frame(i):
+        decimal_utc = (i * 0.25) % 24
+        decl = solar_declination(200)
+        lon = np.linspace(-180, 180, 361)
+        lat = np.linspace(-90, 90, 181)
+        lon2d, lat2d = np.meshgrid(lon, lat)
+        lat_rad = np.deg2rad(lat2d)
+        hour_angle_rad = np.deg2rad((decimal_utc - 12) * 15 + lon2d)
+        cos_zenith = np.sin(lat_rad) * np.sin(decl) + np.cos(lat_rad) * np.cos(decl) * np.cos(hour_angle_rad)
+        shade = ax.contourf(
+            lon, lat, cos_zenith < 0,
+            levels=[0.5, 1],
+            colors=['#000000'],
+            alpha=0.7,
+            transform=ccrs.PlateCarree()
+        )
+        ax.draw_artist(shade)
+        shade.remove()
+
+    return frame
+
+
+def twilight_overlay():
+    canvas, ax = _make_axes()
+    grid = SolarGrid(step=1.0)
+    levels = [
+        -1.01,
+        TWILIGHT_THRESHOLDS["astronomical"],
+        TWILIGHT_THRESHOLDS["nautical"],
+        TWILIGHT_THRESHOLDS["civil"],
+        0.0,
+    ]
+    shade = ax.add_collection(PathCollection(
+        [],
+        facecolors=[(0, 0, 0, alpha) for alpha in (0.7, 0.55, 0.4, 0.25)],
+        edgecolors='none',
+        linewidths=0,
+        transform=ax.transData
+    ), autolim=False)
+    marker, = ax.plot([0], [0], marker='o', transform=ccrs.PlateCarree())
+
+    def frame(i):
+        decimal_utc = (i * 0.25) % 24
+        grid.evaluate(decimal_utc, 200)
+        shade.set_paths([Path(vertices, codes) for vertices, codes in grid.band_polygons(levels)])
+        sun_lon, sun_lat = subsolar_point(decimal_utc, 200)
+        marker.set_data([sun_lon], [sun_lat])
+        ax.draw_artist(shade)
+        ax.draw_artist(marker)
+
+    return frame
+
+
+def tier_frame(tier):
+    def setup():
+        renderer = MapRenderer(1000, 600, tier=tier)
+        return lambda i: renderer.render((i * 0.25) % 24, 200)
+    return setup
+
+
+def main(frames=50):
+    legacy = _frame_times(legacy_overlay, frames)
+    current = _frame_times(twilight_overlay, frames)
+    print(f"legacy night shade        median {np.median(legacy):7.2f} ms   p95 {np.percentile(legacy, 95):7.2f} ms")
+    print(f"twilight bands + subsolar median {np.median(current):7.2f} ms   p95 {np.percentile(current, 95):7.2f} ms")
+    regressed = np.median(current) > np.median(legacy)
+    print("REGRESSION" if regressed else "OK: twilight overlay is not slower than the old night shade")
+    for tier, settings in enumerate(QUALITY_TIERS):
+        times = _frame_times(tier_frame(tier), frames)
+        print(f"tier {settings['name']:<8} frame     median {np.median(times):7.2f} ms   p95 {np.percentile(times, 95):7.2f} ms")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,20 @@
+"""
+Prewarm the reverse-geocoding cache (GeoCache.db next to the app) from a CSV
+with latitude, longitude and city columns, then print the cache stats.
+
+Run from the Code folder:  python bench/prewarm_geocache.py [cities.csv]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Geodb_manager import GeoDBManager
+
+
+if __name__ == "__main__":
+    manager = GeoDBManager()
+    if len(sys.argv) > 1:
+        print(f"Loaded {manager.prewarm(sys.argv[1])} rows")
+    print(manager.stats())
+    manager.close()
@@ -0,0 +1,49 @@
+"""
+Time the expense reads of one TodayPage refresh, uncached and cached, on a
+new temporary database with a month of records (never an existing one, the
+records would stay in it).
+
+Run from the Code folder:  python bench/query_cache.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ConnectionPool import close_shared
+from Expdb_manager import DB_NAME, ExpDBManager
+
+
+def run(path):
+    manager = ExpDBManager(path)
+    today = date.today().isoformat()
+    manager.insert_pay_data_many((f"{today[:8]}{day:02d}", "12:00", "Card", -1.25, "Food", "Cafe", "")
+                                 for day in range(1, 29) for _ in range(500))
+
+    def refresh():
+        manager.fetch_pay_data_by_date(today)
+        manager.get_daily_statistics(today)
+        manager.get_monthly_statistics(today[:7])
+        manager.get_budget_for_month(today[:7])
+
+    for name in ("uncached", "cached"):
+        start = time.perf_counter()
+        for _ in range(100):
+            if name == "uncached":
+                manager.cache.invalidate()
+            refresh()
+        print(f"{name}: {(time.perf_counter() - start) * 10:.3f} ms per refresh")
+    print(manager.cache_stats())
+    manager.close()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, DB_NAME)
+        try:
+            run(path)
+        finally:
+            close_shared(path)
@@ -0,0 +1,54 @@
+"""
+Per-row allocations of the ToDo pages' task loading: the old
+sqlite3.Row -> dict -> renamed dict path versus Task straight from the
+row factory.
+
+Run from the Code folder:  python bench/record_rows.py
+"""
+import os
+import sqlite3
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Records import Task
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, color TEXT, category TEXT, title TEXT, "
+                 "date TEXT, degree TEXT, description TEXT, collected INTEGER)")
+    rows = 10000
+    conn.executemany("INSERT INTO tasks (color, category, title, date, degree, description, collected) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [("#FF6666", "Work", f"task {i}", "2025-03-01", "Easy", "", i % 2) for i in range(rows)])
+    columns = ", ".join(Task.__slots__)
+
+    def before():
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        fetched = [dict(row) for row in cursor.execute(f"SELECT {columns} FROM tasks")]
+        return [{
+            "id": row["id"], "category_color": row["color"], "category": row["category"],
+            "title": row["title"], "date": row["date"], "degree": row["degree"],
+            "description": row["description"], "collected": bool(row["collected"])
+        } for row in fetched]
+
+    def after():
+        cursor = conn.cursor()
+        cursor.row_factory = Task.from_row
+        return cursor.execute(f"SELECT {columns} FROM tasks").fetchall()
+
+    for name, load in (("dicts", before), ("records", after)):
+        load()
+        tracemalloc.start()
+        result = load()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+        size = sum(stat.size for stat in snapshot.statistics("filename"))
+        print(f"{name}: {blocks / rows:.1f} allocations and {size / rows:.0f} bytes kept per row, "
+              f"{peak / rows:.0f} bytes per row at peak")
+        del result
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+shapefile = pytest.importorskip("shapefile")
+pytest.importorskip("shapely")
+
+import FeatureCache as feature_cache_module
+from FeatureCache import MAP_FEATURES, FeatureCache
+
+
+@pytest.fixture
+def shapefiles(tmp_path):
+    # one small shapefile per Natural Earth layer: two squares for land and
+    # ocean, an open line for the coastline
+    paths = {}
+    for name, (category, ne_name, polygons) in MAP_FEATURES.items():
+        path = str(tmp_path / f"ne_{ne_name}")
+        with shapefile.Writer(path, shapeType=shapefile.POLYGON if polygons else shapefile.POLYLINE) as writer:
+            writer.field("name", "C")
+            if polygons:
+                writer.poly([[[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]]])
+                writer.record("a")
+                writer.poly([[[20, 20], [20, 30], [30, 30], [30, 20], [20, 20]]])
+                writer.record("b")
+            else:
+                writer.line([[[0, 0], [5, 1], [10, 0], [15, 2]]])
+                writer.record("a")
+        paths[ne_name] = path + ".shp"
+    return paths
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, shapefiles):
+    # a cold cache: no files on disk and nothing loaded in this process
+    monkeypatch.setattr(FeatureCache, "_loaded", {})
+    monkeypatch.setattr(feature_cache_module, "_shapefile_path",
+                        lambda scale, category, name: shapefiles[name])
+    return FeatureCache(str(tmp_path / "map_cache"))
+
+
+def test_cold_cache_builds_and_saves(cache):
+    paths = cache.get_paths("110m", 0.1)
+    assert os.path.exists(cache.cache_file("110m", 0.1))
+    assert set(paths) == set(MAP_FEATURES)
+    # two closed rings of five vertices, one open line of four
+    assert len(paths["land"].vertices) == 10
+    assert len(paths["coastline"].vertices) == 4
+
+
+def test_saved_cache_loads_without_shapefiles(cache, monkeypatch):
+    built = cache.get_paths("110m", 0.1)
+    monkeypatch.setattr(FeatureCache, "_loaded", {})
+
+    def offline(scale, category, name):
+        raise OSError("offline")
+
+    monkeypatch.setattr(feature_cache_module, "_shapefile_path", offline)
+    loaded = cache.get_paths("110m", 0.1)
+    for name in MAP_FEATURES:
+        assert np.array_equal(loaded[name].vertices, built[name].vertices)
+        assert np.array_equal(loaded[name].codes, built[name].codes)
+    # another tolerance falls back to the saved file instead of an empty map
+    assert len(cache.get_paths("110m", 0.4)["land"].vertices) == 10
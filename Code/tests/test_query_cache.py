@@ -0,0 +1,35 @@
+import pytest
+
+from Expdb_manager import ExpDBManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ExpDBManager(str(tmp_path / "expenses.db"))
+    manager.insert_pay_data_many([
+        ("2025-03-01", "09:00", "Card", -4.5, "Food", "Cafe", ""),
+        ("2025-03-01", "18:00", "Card", 100.0, "Work", "Salary", ""),
+    ])
+    yield manager
+    manager.close()
+
+
+def test_cached_records_are_read_only(manager):
+    record = manager.fetch_pay_data_by_date("2025-03-01")[0]
+    with pytest.raises(TypeError):
+        record["amount"] = 0
+    with pytest.raises(AttributeError):
+        record.amount = 0
+    editable = record.to_dict()
+    editable["amount"] = 0
+    assert manager.fetch_pay_data_by_date("2025-03-01")[0]["amount"] == record["amount"]
+
+
+def test_changing_a_cached_result_does_not_change_the_cache(manager):
+    records = manager.fetch_pay_data_by_date("2025-03-01")
+    records.clear()
+    statistics = manager.get_daily_statistics("2025-03-01")
+    statistics["expense"] = 0
+    assert len(manager.fetch_pay_data_by_date("2025-03-01")) == 2
+    assert manager.get_daily_statistics("2025-03-01")["expense"] == 4.5
+    assert manager.cache_stats()["hits"] == 2
@@ -0,0 +1,75 @@
+"""
+The expense reads must search pay_data (or the monthly_category_totals
+rollup) through the index meant for them, never scan pay_data. Each read
+method is run against a new database with the statements traced, and the
+EXPLAIN QUERY PLAN of every SELECT it ran must contain the expected step.
+"""
+import re
+
+import pytest
+
+from Expdb_manager import ExpDBManager
+
+BY_DATE = "SEARCH pay_data USING INDEX idx_pay_data_date"
+BY_CATEGORY_DATE = "SEARCH pay_data USING INDEX idx_pay_data_category_date"
+TOTALS_BY_MONTH = "SEARCH monthly_category_totals USING PRIMARY KEY"
+TOTALS_BY_CATEGORY = "SEARCH monthly_category_totals USING INDEX idx_monthly_totals_category"
+
+# method, arguments, expected plan step of each query it runs (COVERING is
+# ignored, whether SQLite can skip the table depends on the selected columns)
+READS = [
+    ("fetch_pay_data_by_date", ("2025-03-01",), [f"{BY_DATE} (date=?)"]),
+    ("fetch_pay_data_by_month", ("2025-03",), [f"{BY_DATE} (date>? AND date<?)"]),
+    ("fetch_pay_data_by_category", ("Food",), [f"{BY_CATEGORY_DATE} (category=?)"]),
+    ("fetch_pay_data_by_month_and_category", ("2025-03", "Food"),
+     [f"{BY_CATEGORY_DATE} (category=? AND date>? AND date<?)"]),
+    ("page_pay_data_by_category", ("Food", ("2025-03-01", "12:00", 10)),
+     [f"{BY_CATEGORY_DATE} (category=? AND date<?)"]),
+    ("page_pay_data_by_month", ("2025-03", ("2025-03-01", "12:00", 10)), [f"{BY_DATE} (date>? AND date<?)"]),
+    ("exists_pay_data_in_category", ("Food",), [f"{BY_CATEGORY_DATE} (category=?)"]),
+    ("count_pay_data_by_category", ("Food",), [f"{TOTALS_BY_CATEGORY} (category=?)"]),
+    ("count_pay_data_by_month", ("2025-03",), [f"{TOTALS_BY_MONTH} (month=?)"]),
+    ("get_daily_statistics", ("2025-03-01",), [f"{BY_DATE} (date=?)"]),
+    ("get_monthly_statistics", ("2025-03",), [f"{TOTALS_BY_MONTH} (month=?)"]),
+    ("get_yearly_statistics", ("2025",), [f"{TOTALS_BY_MONTH} (month>? AND month<?)"]),
+    ("get_period_statistics", (["2025-01", "2025-02", "2025-03"],), [f"{TOTALS_BY_MONTH} (month>? AND month<?)"]),
+    ("get_category_net_by_month", ("2025-03",), [f"{TOTALS_BY_MONTH} (month=?)"]),
+    ("get_category_net_by_year", ("2025",), [f"{TOTALS_BY_MONTH} (month>? AND month<?)"]),
+    ("get_expense_by_category_by_month", ("2025-03",), [f"{TOTALS_BY_MONTH} (month=?)"]),
+    ("get_expense_by_category_by_year", ("2025",), [f"{TOTALS_BY_MONTH} (month>? AND month<?)"]),
+    ("fetch_all_months_with_stats_by_category", ("Food",), [f"{TOTALS_BY_CATEGORY} (category=?)"]),
+    # every month is wanted: one pass over the rollup (a row per month and
+    # category), not over pay_data
+    ("fetch_all_months_with_stats", (), ["SCAN monthly_category_totals"]),
+    ("get_years", (), ["SCAN monthly_category_totals USING INDEX idx_monthly_totals_category"]),
+]
+
+# a plan step walking all of pay_data (or all of one of its indexes); pay_data_fts is fine
+FULL_SCAN = re.compile(r"^SCAN pay_data\b(?!_)")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ExpDBManager(str(tmp_path / "expenses.db"))
+    manager.insert_pay_data_many(
+        (f"2025-{month:02d}-{day:02d}", "12:00", "Card", -1.5, category, "Cafe", "")
+        for month in range(1, 13) for day in range(1, 29) for category in ("Food", "Work")
+    )
+    yield manager
+    manager.close()
+
+
+@pytest.mark.parametrize("method, args, expected", READS, ids=[name for name, _, _ in READS])
+def test_reads_use_their_index(manager, method, args, expected):
+    statements = []
+    manager.conn.set_trace_callback(statements.append)
+    try:
+        getattr(manager, method)(*args)
+    finally:
+        manager.conn.set_trace_callback(None)
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+    assert len(selects) == len(expected), (method, selects)
+    for sql, step in zip(selects, expected):
+        plan = [line.replace("COVERING INDEX", "INDEX") for line in manager.explain(sql)]
+        assert step in plan, (method, sql, plan)
+        assert not any(FULL_SCAN.match(line) for line in plan), (method, sql, plan)